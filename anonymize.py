@@ -0,0 +1,264 @@
+import os
+import re
+import sys
+import logging
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from email_parser import HEADER_RE
+from fpe import encrypt_entities, load_key, make_encryptor
+from parsed_cache import ROW_GROUP_SIZE, build_cache
+from pii_entities import corpus_entities_path
+from pii_store import DIGEST_COLUMN, read_entity_table
+from pii_tokens import text_digest
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+ANONYMIZED_OUTPUT = "emails_anonymized.parquet"
+# redact: '[EMAIL]'; mask: letters and digits become '*'; fpe: format-preserving token (see fpe)
+MODES = ('redact', 'mask', 'fpe')
+# Address headers whose names and addresses are rewritten
+ANONYMIZED_HEADERS = {'From', 'To', 'Cc', 'Bcc', 'X-From', 'X-To', 'X-cc', 'X-bcc'}
+# Entity group given to display names found in address headers
+HEADER_NAME_GROUP = 'NAME'
+ADDRESS_ITEM_RE = re.compile(r'[^,]+')
+MASK_RE = re.compile(r'\w')
+
+
+def rewrite_spans(text: str, spans: Sequence[Tuple[int, int]], replacements: Sequence[str]) -> str:
+    """
+    Replace each (start, end) span of `text` with its replacement in one
+    left-to-right pass; spans must be sorted by start. A span overlapping
+    one already written is skipped.
+    """
+    pieces = []
+    pos = 0
+    for (start, end), replacement in zip(spans, replacements):
+        if start < pos:
+            continue
+        pieces.append(text[pos:start])
+        pieces.append(replacement)
+        pos = end
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+
+
+def header_entities(headers: str) -> List[dict]:
+    """
+    Entities for the address headers in a raw header block: each
+    comma-separated item becomes an EMAIL span if it is a bare address,
+    otherwise a NAME span for the display name plus an EMAIL span for the
+    part inside '<...>'. Folded continuation lines are covered.
+    """
+    entities = []
+    for m in HEADER_RE.finditer(headers):
+        if m.group(1) not in ANONYMIZED_HEADERS:
+            continue
+        for item in ADDRESS_ITEM_RE.finditer(headers, m.start(2), m.end(2)):
+            value = item.group().strip()
+            if not value:
+                continue
+            start = item.start() + item.group().index(value)
+            lt = value.find('<')
+            if lt == -1:
+                group = 'EMAIL' if '@' in value else HEADER_NAME_GROUP
+                entities.append({'entity_group': group, 'start': start, 'end': start + len(value)})
+                continue
+            name = value[:lt].rstrip()
+            if name:
+                entities.append({'entity_group': HEADER_NAME_GROUP, 'start': start, 'end': start + len(name)})
+            gt = value.find('>', lt)
+            inner_end = gt if gt != -1 else len(value)
+            if inner_end > lt + 1:
+                entities.append({'entity_group': 'EMAIL', 'start': start + lt + 1, 'end': start + inner_end})
+    return entities
+
+
+def replacement_tokens(texts: Sequence[str], entities: Sequence[List[dict]], mode: str,
+                       encryptor=None, stats: Optional[dict] = None) -> List[List[str]]:
+    """
+    One replacement string per entity of each text, for the given mode.
+    FPE tokens are encrypted in batches per entity group across all texts.
+    """
+    if mode == 'fpe':
+        return encrypt_entities(texts, entities, encryptor, stats=stats)
+    if mode == 'mask':
+        return [[MASK_RE.sub('*', text[e['start']:e['end']]) for e in row] for text, row in zip(texts, entities)]
+    return [[f"[{e['entity_group']}]" for e in row] for row in entities]
+
+
+def anonymize_texts(texts: Sequence[str], entities: Sequence[List[dict]], mode: str = 'redact',
+                    encryptor=None, stats: Optional[dict] = None) -> List[str]:
+    """
+    Rewrite every text with its entities replaced (see MODES). Entities are
+    sorted by offset here; spans outside the text are dropped.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, not {mode!r}")
+    entities = [
+        sorted((e for e in row if 0 <= e['start'] < e['end'] <= len(text)), key=lambda e: e['start'])
+        for text, row in zip(texts, entities)
+    ]
+    tokens = replacement_tokens(texts, entities, mode, encryptor, stats)
+    return [rewrite_spans(text, [(e['start'], e['end']) for e in row], row_tokens) if row else text
+            for text, row, row_tokens in zip(texts, entities, tokens)]
+
+
+def _entities_by_row(entity_df, first: int, count: int) -> Tuple[List[List[dict]], List[Optional[bytes]]]:
+    """
+    Slice the entity table (sorted by row_id) to rows first..first+count-1
+    and group it into per-row entity lists, plus each row's text digest
+    (None for rows without entities).
+    """
+    row_col = entity_df['row_id'].to_numpy()
+    lo, hi = np.searchsorted(row_col, [first, first + count])
+    rows = [[] for _ in range(count)]
+    digests = [None] * count
+    for row, group, start, end, word, digest in zip(
+            row_col[lo:hi].tolist(), entity_df['entity_group'].iloc[lo:hi], entity_df['start'].iloc[lo:hi].tolist(),
+            entity_df['end'].iloc[lo:hi].tolist(), entity_df['word'].iloc[lo:hi], entity_df[DIGEST_COLUMN].iloc[lo:hi]):
+        rows[row - first].append({'entity_group': group, 'start': start, 'end': end, 'word': word})
+        digests[row - first] = digest
+    return rows, digests
+
+
+def word_key(text: str) -> str:
+    """
+    Letters and digits of `text`, case-folded and without accents: what an
+    entity's 'word' (decoded by the tokenizer, so possibly lowercased or
+    carrying '##' subword marks) has in common with the span it came from.
+    """
+    return ''.join(c for c in unicodedata.normalize('NFKD', text).casefold() if c.isalnum())
+
+
+def check_entities(bodies: Sequence[Optional[str]], entities: Sequence[List[dict]],
+                   digests: Sequence[Optional[bytes]], row_ids: Sequence[int]) -> int:
+    """
+    ValueError unless every body with entities hashes to the digest stored
+    with them, i.e. the offsets were computed on this very text. Entities
+    whose span body[start:end] does not hold their 'word' (see word_key) are
+    logged and still rewritten, since the digest vouches for the offsets.
+    Returns the number of such mismatches.
+    """
+    mismatches = 0
+    for body, row_entities, digest, row in zip(bodies, entities, digests, row_ids):
+        if not row_entities:
+            continue
+        if body is None or text_digest(body) != digest:
+            raise ValueError(f"Entities of row {row} were detected on a different text than its parsed Body; "
+                             f"rebuild the entity table with pii_entities.detect_corpus")
+        for e in row_entities:
+            if e.get('word') is not None and word_key(body[e['start']:e['end']]) != word_key(e['word']):
+                mismatches += 1
+                logging.warning(f"Entity {e['word']!r} of row {row} does not match its span "
+                                f"{body[e['start']:e['end']]!r} at {e['start']}:{e['end']}; rewriting the span")
+    return mismatches
+
+
+def anonymize_corpus(source, entities_path=None, out_path=ANONYMIZED_OUTPUT,
+                     mode: str = 'redact', min_score: Optional[float] = None,
+                     batch_size: int = ROW_GROUP_SIZE, key: Optional[bytes] = None,
+                     entity_groups: Optional[Sequence[str]] = None,
+                     rows: Optional[Sequence[int]] = None) -> Dict[str, int]:
+    """
+    Stream the parsed corpus for `source` (see parsed_cache) batch by batch
+    and write 'file', 'Headers' and 'Body' with PII rewritten to `out_path`.
+    Body spans come from the flat entity table at `entities_path` (default
+    corpus_entities_path, as written by pii_entities.detect_corpus),
+    optionally filtered by `min_score` and `entity_groups`, so a new
+    threshold needs no model run; address headers are rewritten via
+    header_entities. Rows whose Body does not match the text digest stored
+    with their entities raise ValueError (see check_entities), as does a
+    table without digests, since its offsets may point into other text;
+    spans that do not hold their entity's word are logged and counted. With `rows`, only
+    those source rows are written. Only the entity table and one batch of
+    rows are held in memory. In 'fpe' mode the key defaults to load_key().
+    Returns row and entity counts.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, not {mode!r}")
+    encryptor = make_encryptor(key or load_key()) if mode == 'fpe' else None
+    entities_path = entities_path or corpus_entities_path(source)
+    entity_df = read_entity_table(entities_path, entity_groups=entity_groups, min_score=min_score,
+                                  rows=rows).sort_values(['row_id', 'start'], kind='stable')
+    if DIGEST_COLUMN not in entity_df.columns:
+        raise ValueError(f"{entities_path} has no text digests to check its offsets against; "
+                         f"rebuild it with pii_entities.detect_corpus")
+    wanted = np.unique(np.asarray(rows, dtype=np.int64)) if rows is not None else None
+
+    pf = pq.ParquetFile(build_cache(source), memory_map=True)
+    schema = pa.schema([(col, pa.string()) for col in ('file', 'Headers', 'Body')])
+    counts = {'rows': 0, 'body_entities': 0, 'header_entities': 0, 'word_mismatches': 0}
+    fpe_stats = {}
+    # Source row id of the first row of the current batch
+    first = 0
+    tmp_path = Path(out_path).with_name(Path(out_path).name + '.tmp')
+    try:
+        with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+            for batch in pf.iter_batches(batch_size=batch_size, columns=['file', 'Headers', 'Body']):
+                n = batch.num_rows
+                body_entities, digests = _entities_by_row(entity_df, first, n)
+                batch_rows = np.arange(first, first + n)
+                if wanted is not None:
+                    keep = np.flatnonzero(np.isin(batch_rows, wanted))
+                    batch = batch.take(pa.array(keep))
+                    body_entities = [body_entities[i] for i in keep]
+                    digests = [digests[i] for i in keep]
+                    batch_rows = batch_rows[keep]
+                first += n
+                headers = batch.column('Headers').to_pylist()
+                bodies = batch.column('Body').to_pylist()
+                counts['word_mismatches'] += check_entities(bodies, body_entities, digests, batch_rows.tolist())
+                head_entities = [header_entities(h) for h in headers]
+                # One call so FPE batches header and body values of a group together
+                rewritten = anonymize_texts(bodies + headers, body_entities + head_entities, mode, encryptor,
+                                            fpe_stats)
+
+                writer.write_table(pa.Table.from_arrays(
+                    [batch.column('file'), pa.array(rewritten[len(bodies):]), pa.array(rewritten[:len(bodies)])],
+                    schema=schema))
+                counts['rows'] += len(bodies)
+                counts['body_entities'] += sum(len(row) for row in body_entities)
+                counts['header_entities'] += sum(len(row) for row in head_entities)
+                log_msg = f"Anonymized {first:,} of {pf.metadata.num_rows:,} records"
+                print(log_msg)
+                logging.info(log_msg)
+    except BaseException:
+        # A refused or failed run leaves no partial corpus behind
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, out_path)
+
+    logging.info(f"Wrote {mode} corpus to {out_path}: {counts['rows']:,} rows, "
+                 f"{counts['body_entities']:,} body and {counts['header_entities']:,} header entities "
+                 f"({counts['word_mismatches']:,} spans not matching their word)")
+    return counts
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else "emails.csv"
+    entities_path = sys.argv[2] if len(sys.argv) > 2 else None
+    mode = sys.argv[3] if len(sys.argv) > 3 else 'redact'
+    min_score = float(sys.argv[4]) if len(sys.argv) > 4 else None
+    try:
+        anonymize_corpus(source, entities_path, mode=mode, min_score=min_score)
+    except FileNotFoundError as e:
+        logging.error(f"Input not found: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        logging.error(f"Cannot anonymize {source}: {e}")
+        sys.exit(1)
+    print(f"Done. Anonymized corpus saved to {ANONYMIZED_OUTPUT}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import logging
+import platform
+import subprocess
+from pathlib import Path
+from typing import Sequence
+import dataset_cleaned_headers_body
+import dataset_Confidential_cleaned_header_body
+import dataset_groupby_subject
+import X_dataset_cleaned_columns
+import X_test_func_parse_clean
+from email_parser import HEADERS_ORDER, parse_series
+from loader import readdataset
+from metrics import new_run, record_latencies, report, stage, text_bytes
+from parsed_cache import CACHE_DIR
+from pii_entities import identify_pii
+from pii_stub import load_stub_pipeline
+from synthetic_corpus import write_corpus
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# Generated corpora are kept here and reused across runs
+BENCH_DIR = Path(CACHE_DIR) / "bench"
+# Every benchmark stage of every run is appended here (commit it to track results over time)
+BENCH_RESULTS = "bench_results.jsonl"
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+BENCH_SEED = 42
+
+# parse_series configurations used by the scripts
+PARSE_VARIANTS = {
+    'raw': dict(fields=()),                                    # dataset_cleaned_headers_body
+    'joined': dict(fields=HEADERS_ORDER, headers='joined'),    # X_dataset_cleaned_columns
+    'all_fields': dict(fields=None),                           # X_test_func_parse_clean
+    'cache': dict(fields=HEADERS_ORDER),                       # parsed_cache
+    'normalized': dict(fields=(), normalize=dataset_cleaned_headers_body.BODY_NORMALIZER),
+}
+CLEAN_VARIANTS = {
+    'X_test': X_test_func_parse_clean.clean_dataframe,
+    'X_dataset': X_dataset_cleaned_columns.clean_dataframe,
+    'headers_body': dataset_cleaned_headers_body.clean_dataframe,
+    'confidential': dataset_Confidential_cleaned_header_body.clean_dataframe,
+    'groupby': dataset_groupby_subject.clean_dataframe,
+}
+
+
+def git_commit() -> str:
+    """
+    Short hash of the checked-out commit, or 'unknown' outside a git checkout.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def synthetic_path(rows: int, seed: int = BENCH_SEED) -> Path:
+    """
+    Synthetic corpus of `rows` messages, generated on first use.
+    """
+    path = BENCH_DIR / f"synthetic_{rows}_{seed}.csv"
+    if not path.is_file():
+        write_corpus(path, rows, seed)
+    return path
+
+
+def run_benchmarks(rows: int, seed: int = BENCH_SEED, results_path: str = BENCH_RESULTS) -> dict:
+    """
+    Time loading, every parse and clean variant, subject grouping and
+    identify_pii (with the stub pipeline) on a synthetic corpus of `rows`
+    messages. Each stage is a metrics stage written to `results_path`.
+    """
+    path = synthetic_path(rows, seed)
+    run = new_run(results_path, meta={'benchmark_rows': rows, 'seed': seed, 'commit': git_commit(),
+                                      'python': platform.python_version(), 'cpus': os.cpu_count()})
+
+    for engine in ('c', 'pyarrow'):
+        with stage(run, f"readdataset[{engine}]", nbytes=os.path.getsize(path)) as st:
+            df = readdataset(path, engine=engine)
+            st['rows'] = len(df)
+
+    message_bytes = text_bytes(df['message'])
+    parsed = None
+    for name, kwargs in PARSE_VARIANTS.items():
+        with stage(run, f"parse[{name}]", rows=len(df), nbytes=message_bytes) as st:
+            latencies = []
+            variant = parse_series(df['message'], files=df['file'], latencies=latencies, **kwargs)
+            record_latencies(st, latencies, df['file'])
+        # Later stages run on the parsed-cache layout: every header field and an uncleaned Body
+        if name == 'cache':
+            parsed = variant
+
+    body_bytes = text_bytes(parsed['Body'])
+    for name, clean in CLEAN_VARIANTS.items():
+        frame = parsed[['file', 'Headers', 'Body']].copy()
+        with stage(run, f"clean[{name}]", rows=len(frame), nbytes=body_bytes):
+            clean(frame)
+
+    with stage(run, 'group_subjects', rows=len(parsed)):
+        dataset_groupby_subject.select_subject_groups(parsed[['file', 'Subject']])
+
+    bodies = X_test_func_parse_clean.clean_dataframe(parsed[['Body']].copy())
+    with stage(run, 'identify_pii[stub]', rows=len(bodies), nbytes=text_bytes(bodies['Body'])) as st:
+        row_seconds = []
+        pii_df = identify_pii(bodies, text_column='Body', loader=load_stub_pipeline, row_seconds=row_seconds)
+        st['tokens'] = pii_df.attrs['pii_stats'].get('tokens', 0)
+        record_latencies(st, row_seconds, df['file'])
+    return run
+
+
+def compare_with_previous(run: dict, results_path: str = BENCH_RESULTS) -> None:
+    """
+    Print each stage's rows/s against the most recent earlier run at the same size.
+    """
+    rows = run['meta']['benchmark_rows']
+    previous = {}
+    with open(results_path, encoding='utf-8') as fh:
+        for line in fh:
+            record = json.loads(line)
+            if record['run_id'] != run['run_id'] and record.get('benchmark_rows') == rows:
+                previous[record['stage']] = record
+    for current in run['stages']:
+        before = previous.get(current['stage'])
+        if before and before['rows_per_sec'] and current['rows_per_sec']:
+            change = current['rows_per_sec'] / before['rows_per_sec'] - 1
+            print(f"{current['stage']:<24}{current['rows_per_sec']:>14,.1f} rows/s "
+                  f"({change:+.1%} vs {before['commit']})")
+
+
+def main(sizes: Sequence[int] = DEFAULT_SIZES):
+    sizes = [int(arg) for arg in sys.argv[1:]] or list(sizes)
+    for rows in sizes:
+        print(f"Benchmarking {rows:,} rows")
+        run = run_benchmarks(rows)
+        report(run)
+        compare_with_previous(run)
+
+
+if __name__ == '__main__':
+    main()
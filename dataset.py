@@ -1,9 +1,10 @@
 import os
-import csv
 import sys
 import logging
 from pathlib import Path
+from typing import Optional
 import pandas as pd
+from sampler import DEFAULT_SEED, sample_records
 os.environ["DISSERTATION_DATA"] = "/home/roopam/Downloads/RDDissertation"
 
 
@@ -17,33 +18,16 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
-# Increase CSV field size limit to handle large email bodies
-csv.field_size_limit(sys.maxsize)
 
-def readdataset(path: str = "emails.csv") -> pd.DataFrame:
+def sample_subset(input_path: str, subset_size: int = 1000, output_dir: str = '.',
+                  seed: int = DEFAULT_SEED, stratify_by: Optional[str] = None) -> pd.DataFrame:
     """
-    Load the Enron emails CSV into a DataFrame, handling large fields.
-    """
-    csv_path = Path(path)
-    if not csv_path.is_file():
-        logging.error(f"CSV file not found: {csv_path}")
-        sys.exit(1)
-    try:
-        df = pd.read_csv(csv_path, encoding='utf-8', engine='python')
-        logging.info(f"Loaded dataset from {csv_path} ({len(df):,} rows)")
-        return df
-    except Exception as e:
-        logging.exception(f"Failed to read CSV: {e}")
-        sys.exit(1)
-
-
-def sample_subset(input_path: str, subset_size: int = 1000, output_dir: str = '.') -> pd.DataFrame:
-    """
-    Sample rows from the dataset and save to a CSV.
+    Sample rows from the dataset in one streaming pass and save to a CSV.
+    `stratify_by` ('owner' or 'folder') samples each mailbox owner or
+    X-Folder in proportion to its size (see sampler).
     """
     logging.info(f"Sampling {subset_size} rows from {input_path}")
-    df_full = readdataset(input_path)
-    df_sub = df_full.sample(n=subset_size, random_state=42)
+    df_sub = sample_records(input_path, subset_size, seed=seed, stratify_by=stratify_by)
     logging.info(f"Sampled {len(df_sub):,} rows")
 
     out_name = f"emails_{subset_size}.csv"
@@ -66,8 +50,12 @@ def main():
     input_folder = Path(os.environ["DISSERTATION_DATA"])
     input_file = input_folder / "emails.csv"
 
-    # 2. Sample 1000 rows and get back a DataFrame
-    subset_df = sample_subset(input_file, subset_size=100, output_dir=".")
+    # 2. Sample rows and get back a DataFrame: dataset.py [size] [owner|folder] [seed]
+    subset_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    stratify_by = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] != 'none' else None
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_SEED
+    subset_df = sample_subset(input_file, subset_size=subset_size, output_dir=".",
+                              seed=seed, stratify_by=stratify_by)
     print(subset_df.head())
 
 
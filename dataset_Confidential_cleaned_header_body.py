@@ -1,10 +1,10 @@
 import os
-import sys
 import logging
-import re
 from pathlib import Path
 import pandas as pd
-import csv
+from metrics import new_run, report, stage, text_bytes
+from header_scan import header_filter, materialize, scan_headers
+from text_normalizer import BLANK_RUNS, make_normalizer, normalize_series
 
 # Set up environment (adjust if needed)
 os.environ.setdefault("DISSERTATION_DATA", "/home/roopam/Downloads/RDDissertation")
@@ -18,47 +18,11 @@ logging.basicConfig(
     datefmt=timestamp
 )
 
-# Increase CSV field size limit to handle large email bodies
-csv.field_size_limit(sys.maxsize)
-
 # Constants for dataset files
 EMAILS_SUBSET_CSV = str(Path(os.environ["DISSERTATION_DATA"]) / "emails.csv") # full dataset
 OUTPUT_CSV = "confidential_emails_parsed_cleaned.csv"
-
-
-def readdataset(path: str) -> pd.DataFrame:
-    """
-    Load the Enron emails CSV into a DataFrame, handling large fields.
-    Expects columns: 'file' and 'message'.
-    """
-    csv_path = Path(path)
-    if not csv_path.is_file():
-        logging.error(f"CSV file not found: {csv_path}")
-        sys.exit(1)
-    try:
-        df = pd.read_csv(csv_path, encoding='utf-8', engine='python')
-        logging.info(f"Loaded dataset from {csv_path} ({len(df):,} rows)")
-        return df
-    except Exception as e:
-        logging.exception(f"Failed to read CSV: {e}")
-        sys.exit(1)
-
-
-def parse_email(row: pd.Series) -> pd.Series:
-    """
-    Simplified: everything before the first blank line is raw headers,
-    and everything after is the body. Returns Series with 'file', 'Headers', and cleaned 'Body'.
-    """
-    raw = row['message']
-    # Normalize line endings
-    text = raw.replace('\r\n', '\n')
-    # Split into headers and body on first blank line
-    parts = text.split('\n\n', 1)
-    headers = parts[0]
-    body = parts[1] if len(parts) > 1 else ''
-    # Clean body: collapse spaces/tabs and trim
-    body_clean = re.sub(r'[ \t]+', ' ', body).strip()
-    return pd.Series({'file': row['file'], 'Headers': headers, 'Body': body_clean})
+# Spaces/tabs, periods, then blank-line runs -> a single line break
+BODY_NORMALIZER = make_normalizer(BLANK_RUNS, "\n")
 
 
 def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
@@ -67,43 +31,35 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     and collapse multiple blank lines in 'Body'; leave 'Headers' unmodified.
     """
     if 'Body' in df.columns:
-        df.loc[:, 'Body'] = (
-            df['Body']
-            .fillna('')
-            .astype(str)
-            .str.replace(r"[ \t]+", ' ', regex=True)
-            .str.strip()
-            .str.replace(r"\.{2,}", '.', regex=True)
-            .str.replace(r"([ \t]*\n){2,}", '\n', regex=True)
-        )
+        df.loc[:, 'Body'] = normalize_series(df['Body'], BODY_NORMALIZER)
     return df
 
 
 def main():
-    # 1. Load full dataset
-    df = readdataset(EMAILS_SUBSET_CSV)
-
-    # 2. Filter records whose Subject header contains 'confidential' (case-insensitive)
-    mask = df['message'].str.contains(r'(?im)^Subject:.*confidential', na=False)
-    df_conf = df[mask].copy()
-    logging.info(f"Found {len(df_conf)} confidential emails")
-    if df_conf.empty:
+    run = new_run()
+
+    # 1-2. Scan only the header block of each record for 'confidential' in the Subject (case-insensitive)
+    with stage(run, 'filter', nbytes=os.path.getsize(EMAILS_SUBSET_CSV)) as st:
+        matches = scan_headers(EMAILS_SUBSET_CSV, header_filter(Subject='confidential'))
+        st['rows'] = len(matches)
+    logging.info(f"Found {len(matches)} confidential emails")
+    if len(matches) == 0:
         print("No emails with 'confidential' found in the subject.")
         return
 
-    # 3. Parse each row of filtered set
-    parsed_df = df_conf.apply(parse_email, axis=1)
-    logging.info("Parsed confidential emails into file, Headers, and Body columns")
-
-    # 4. Clean only the 'Body' column
-    cleaned_df = clean_dataframe(parsed_df)
-    logging.info("Cleaned Body field for confidential emails")
+    # 3-4. Decode and parse file, Headers and Body for the matches only, cleaning only the Body
+    with stage(run, 'parse', rows=len(matches)) as st:
+        cleaned_df = materialize(EMAILS_SUBSET_CSV, matches, normalize=BODY_NORMALIZER)
+        st['bytes'] = text_bytes(cleaned_df['Headers']) + text_bytes(cleaned_df['Body'])
+    logging.info("Parsed confidential emails into file, Headers, and cleaned Body columns")
 
     # 5. Save the output
-    cleaned_df.to_csv(OUTPUT_CSV, index=False, encoding='utf-8')
+    with stage(run, 'write', rows=len(cleaned_df)) as st:
+        cleaned_df.to_csv(OUTPUT_CSV, index=False, encoding='utf-8')
+        st['bytes'] = os.path.getsize(OUTPUT_CSV)
     logging.info(f"Saved parsed & cleaned confidential emails to {OUTPUT_CSV}")
+    report(run)
     print(f"Done. Output saved to {OUTPUT_CSV}")
 
-
 if __name__ == '__main__':
     main()
@@ -0,0 +1,100 @@
+import re
+import time
+from typing import Callable, List, Optional, Sequence
+import pandas as pd
+
+# Bump whenever parsing output changes so cached parses are invalidated
+PARSER_VERSION = 1
+
+# Standard Enron header set, in the order it appears in each message
+HEADERS_ORDER = [
+    'Message-ID', 'Date', 'From', 'To', 'Subject',
+    'Mime-Version', 'Content-Type', 'Content-Transfer-Encoding',
+    'X-From', 'X-To', 'X-cc', 'X-bcc', 'X-Folder', 'X-Origin', 'X-FileName'
+]
+
+# "Name: value" plus any folded continuation lines (leading space/tab)
+HEADER_RE = re.compile(r'^([^\s:][^:\n]*):[ \t]*(.*(?:\n[ \t].*)*)', re.M)
+FOLD_RE = re.compile(r'\s*\n[ \t]+')
+# Runs of spaces/tabs to collapse to one space; a lone space is already collapsed and is skipped
+SPACES_RE = re.compile(r'(?: [\t ]|\t)[\t ]*')
+
+
+def parse_message(raw: str, normalize: Optional[Callable[[str], str]] = None) -> dict:
+    """
+    Scan a raw email once. Returns a dict with:
+      - 'Headers': raw header block (everything before the first blank line),
+      - 'fields': header name -> unfolded value (first occurrence wins),
+      - 'body_start': offset of the body in the line-ending-normalized text,
+      - 'Body': body with spaces/tabs collapsed and trimmed, or cleaned by
+        `normalize` (see text_normalizer) as it is extracted.
+    """
+    text = raw.replace('\r\n', '\n') if '\r' in raw else raw
+    split = text.find('\n\n')
+    if split == -1:
+        headers, body_start = text, len(text)
+    else:
+        headers, body_start = text[:split], split + 2
+
+    fields = {}
+    for m in HEADER_RE.finditer(headers):
+        name = m.group(1)
+        if name not in fields:
+            value = m.group(2)
+            fields[name] = FOLD_RE.sub(' ', value).strip() if '\n' in value else value.strip()
+
+    return {
+        'Headers': headers,
+        'fields': fields,
+        'body_start': body_start,
+        'Body': normalize(text[body_start:]) if normalize else SPACES_RE.sub(' ', text[body_start:]).strip(),
+    }
+
+
+def join_headers(fields: dict, order: Sequence[str] = HEADERS_ORDER) -> str:
+    """
+    Render header fields as 'Name: value | Name: value' in a fixed order,
+    with missing headers given an empty value.
+    """
+    return ' | '.join(f"{name}: {fields.get(name, '')}" for name in order)
+
+
+def parse_series(messages: pd.Series, fields: Optional[Sequence[str]] = (),
+                 files: Optional[pd.Series] = None, headers: str = 'raw',
+                 latencies: Optional[List[float]] = None,
+                 normalize: Optional[Callable[[str], str]] = None) -> pd.DataFrame:
+    """
+    Parse a Series of raw emails into a DataFrame (same index) with columns
+    'file' (when `files` is given), 'Headers', one column per name in `fields`
+    and 'Body'. `fields=None` keeps every header seen, in first-seen order.
+    `headers` is 'raw' for the header block or 'joined' for join_headers().
+    If `latencies` is given, the parse time of each message (seconds) is appended to it.
+    `normalize` is passed to parse_message to clean bodies during the parse.
+    """
+    if latencies is None:
+        parsed = [parse_message(raw if isinstance(raw, str) else '', normalize) for raw in messages]
+    else:
+        parsed = []
+        clock = time.perf_counter
+        for raw in messages:
+            start = clock()
+            parsed.append(parse_message(raw if isinstance(raw, str) else '', normalize))
+            latencies.append(clock() - start)
+
+    if fields is None:
+        names = {}
+        for p in parsed:
+            names.update(dict.fromkeys(p['fields']))
+        fields = list(names)
+
+    out = {}
+    if files is not None:
+        out['file'] = files.to_numpy()
+    if headers == 'joined':
+        out['Headers'] = [join_headers(p['fields']) for p in parsed]
+    else:
+        out['Headers'] = [p['Headers'] for p in parsed]
+    for name in fields:
+        out[name] = [p['fields'].get(name, '') for p in parsed]
+    out['Body'] = [p['Body'] for p in parsed]
+    return pd.DataFrame(out, index=messages.index)
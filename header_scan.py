@@ -0,0 +1,132 @@
+import re
+import sys
+import mmap
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from email_parser import parse_message
+from record_index import RecordIndex, index_is_current, iter_record_offsets
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+DATE_LINE_RE = re.compile(rb'^Date:[ \t]*([^\n]*)', re.M)
+
+# (row id, file, message start, header end, message end); offsets are bytes into the CSV
+HeaderSpan = Tuple[int, str, int, int, int]
+
+
+def iter_header_spans(mm: mmap.mmap) -> Iterator[HeaderSpan]:
+    """
+    Walk a 'file,message' CSV held in `mm` record by record, yielding where
+    each message and its header block (up to the first blank line) lie.
+    Bodies are skipped with C-level byte searches; nothing is decoded.
+    """
+    for row, (_, file, msg_start, header_end, msg_end) in enumerate(iter_record_offsets(mm)):
+        yield row, file, msg_start, header_end, msg_end
+
+
+def _indexed_spans(csv_path: Path) -> Iterator[HeaderSpan]:
+    """
+    Header spans read from the record index instead of walking the CSV.
+    """
+    index = RecordIndex(csv_path, build=False)
+    try:
+        for row, (msg_start, header_end, msg_end) in enumerate(zip(
+                index.msg_start.tolist(), index.header_end.tolist(), index.msg_end.tolist())):
+            yield row, index.file(row), msg_start, header_end, msg_end
+    finally:
+        index.close()
+
+
+def iter_spans(csv_path, mm: mmap.mmap) -> Iterator[HeaderSpan]:
+    """
+    Header spans of every record of the CSV mapped in `mm`: read from the
+    record index when it is current, otherwise found by walking `mm`.
+    """
+    return _indexed_spans(Path(csv_path)) if index_is_current(csv_path) else iter_header_spans(mm)
+
+
+def header_filter(date_range: Optional[Tuple[Optional[datetime], Optional[datetime]]] = None,
+                  **patterns: str) -> Callable[[bytes], bool]:
+    """
+    Build a predicate over a raw header block. Each keyword names a header
+    (underscores for hyphens, e.g. X_Folder) and gives a case-insensitive
+    regex that must occur in its value, folded continuation lines included.
+    `date_range` is an inclusive (start, end) on the Date header; naive
+    datetimes are taken as UTC and either bound may be None.
+    """
+    checks = [
+        re.compile(rb'^' + re.escape(name.replace('_', '-').encode()) +
+                   rb':(?:[^\n]|\n[ \t])*?(?:' + pattern.encode('utf-8') + rb')', re.M | re.I)
+        for name, pattern in patterns.items()
+    ]
+    start, end = [
+        bound.replace(tzinfo=timezone.utc) if bound is not None and bound.tzinfo is None else bound
+        for bound in (date_range or (None, None))
+    ]
+
+    def predicate(headers: bytes) -> bool:
+        if not all(check.search(headers) for check in checks):
+            return False
+        if start is None and end is None:
+            return True
+        m = DATE_LINE_RE.search(headers)
+        try:
+            sent = parsedate_to_datetime(m.group(1).decode('utf-8', 'replace')) if m else None
+        except (TypeError, ValueError):
+            sent = None
+        return sent is not None and (start is None or sent >= start) and (end is None or sent <= end)
+
+    return predicate
+
+
+def scan_headers(path, predicate: Callable[[bytes], bool]) -> List[HeaderSpan]:
+    """
+    Memory-map the CSV and return the spans of records whose header block
+    satisfies `predicate` (see header_filter). Only header bytes are handed
+    to the predicate, so its cost tracks header size, not body size. With an
+    up-to-date record index (see record_index) bodies are not scanned at all.
+    """
+    csv_path = Path(path)
+    if not csv_path.is_file():
+        logging.error(f"CSV file not found: {csv_path}")
+        sys.exit(1)
+    matches = []
+    scanned = 0
+    with open(csv_path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for span in iter_spans(csv_path, mm):
+            scanned += 1
+            headers = mm[span[2]:span[3]]
+            if b'""' in headers:
+                headers = headers.replace(b'""', b'"')
+            if predicate(headers):
+                matches.append(span)
+    logging.info(f"Header scan of {csv_path}: {len(matches):,} of {scanned:,} records match")
+    return matches
+
+
+def materialize(path, spans: List[HeaderSpan],
+                normalize: Optional[Callable[[str], str]] = None) -> pd.DataFrame:
+    """
+    Decode and parse only the matched messages into 'file', 'Headers' and
+    'Body' columns (as parse_message does, with `normalize`), indexed by source row id.
+    """
+    files, headers, bodies = [], [], []
+    with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for _, file, msg_start, _, msg_end in spans:
+            parsed = parse_message(mm[msg_start:msg_end].replace(b'""', b'"').decode('utf-8'), normalize)
+            files.append(file)
+            headers.append(parsed['Headers'])
+            bodies.append(parsed['Body'])
+    return pd.DataFrame({'file': files, 'Headers': headers, 'Body': bodies},
+                        index=np.array([span[0] for span in spans], dtype=np.int64))
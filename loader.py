@@ -0,0 +1,122 @@
+import csv
+import sys
+import logging
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Tuple
+import pandas as pd
+
+# Increase CSV field size limit to handle large email bodies
+csv.field_size_limit(sys.maxsize)
+
+# Rows per chunk when streaming the dataset
+DEFAULT_CHUNKSIZE = 50_000
+# pyarrow parses in byte blocks; each block must hold the largest single row
+PYARROW_BLOCK_SIZE = 64 << 20
+
+
+def _dataset_path(path) -> Path:
+    """
+    Resolve the CSV path, exiting with a logged error if it does not exist.
+    """
+    csv_path = Path(path)
+    if not csv_path.is_file():
+        logging.error(f"CSV file not found: {csv_path}")
+        sys.exit(1)
+    return csv_path
+
+
+def readdataset(path: str = "emails.csv", usecols: Optional[Sequence[str]] = None,
+                engine: str = 'c') -> pd.DataFrame:
+    """
+    Load the Enron emails CSV into a DataFrame, handling large fields.
+    Expects columns: 'file' and 'message'. Prefer iter_dataset() for the full corpus.
+    """
+    csv_path = _dataset_path(path)
+    try:
+        if engine == 'pyarrow':
+            df = pd.concat(iter_dataset(csv_path, usecols=usecols, engine='pyarrow'), ignore_index=True)
+        else:
+            df = pd.read_csv(csv_path, encoding='utf-8', engine=engine, usecols=usecols)
+        logging.info(f"Loaded dataset from {csv_path} ({len(df):,} rows)")
+        return df
+    except Exception as e:
+        logging.exception(f"Failed to read CSV: {e}")
+        sys.exit(1)
+
+
+def _iter_pyarrow(csv_path: Path, chunksize: int, usecols: Optional[Sequence[str]]) -> Iterator[pd.DataFrame]:
+    """
+    Stream the CSV with pyarrow's multithreaded reader, re-slicing its byte-sized
+    record batches into DataFrames of exactly `chunksize` rows (the last may be short).
+    """
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=PYARROW_BLOCK_SIZE),
+        # Email bodies contain quoted newlines
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(usecols) if usecols else None,
+            column_types={'file': pa.string(), 'message': pa.string()},
+        ),
+    )
+    pending = []
+    pending_rows = 0
+    for batch in reader:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows < chunksize:
+            continue
+        table = pa.Table.from_batches(pending)
+        offset = 0
+        while pending_rows - offset >= chunksize:
+            yield table.slice(offset, chunksize).to_pandas()
+            offset += chunksize
+        pending = table.slice(offset).to_batches()
+        pending_rows -= offset
+    if pending_rows:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+def iter_dataset(path: str = "emails.csv", chunksize: int = DEFAULT_CHUNKSIZE,
+                 usecols: Optional[Sequence[str]] = None, engine: str = 'c') -> Iterator[pd.DataFrame]:
+    """
+    Yield the emails CSV as DataFrame chunks of `chunksize` rows so that
+    downstream parse/clean/filter stages run at constant memory.
+    `engine` is 'c' (pandas) or 'pyarrow'. Row indexes run on across chunks.
+    """
+    csv_path = _dataset_path(path)
+    if engine == 'pyarrow':
+        chunks = _iter_pyarrow(csv_path, chunksize, usecols)
+    else:
+        chunks = pd.read_csv(csv_path, encoding='utf-8', engine='c', usecols=usecols, chunksize=chunksize)
+
+    total = 0
+    n_chunks = 0
+    try:
+        for chunk in chunks:
+            chunk.index = pd.RangeIndex(total, total + len(chunk))
+            total += len(chunk)
+            n_chunks += 1
+            yield chunk
+    except Exception as e:
+        logging.exception(f"Failed to read CSV: {e}")
+        sys.exit(1)
+    logging.info(f"Streamed dataset from {csv_path} ({total:,} rows in {n_chunks} chunks)")
+
+
+def iter_records(path: str = "emails.csv") -> Iterator[Tuple[str, str]]:
+    """
+    Yield (file, message) tuples one record at a time without building DataFrames.
+    """
+    csv_path = _dataset_path(path)
+    with open(csv_path, newline='', encoding='utf-8') as fh:
+        reader = csv.reader(fh)
+        header = next(reader, None)
+        if header is None:
+            return
+        file_idx, msg_idx = header.index('file'), header.index('message')
+        for row in reader:
+            yield row[file_idx], row[msg_idx]
@@ -0,0 +1,132 @@
+import sys
+import json
+import time
+import uuid
+import logging
+import resource
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+import numpy as np
+
+# Structured per-stage metrics, one JSON object per line
+METRICS_LOG = "metrics.jsonl"
+# Slowest rows reported per stage
+SLOWEST_ROWS = 5
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+def new_run(path: Optional[str] = METRICS_LOG, meta: Optional[dict] = None) -> dict:
+    """
+    Start a metrics run; pass it to stage(). `meta` (e.g. commit, row count)
+    is copied into every stage record. With `path` None nothing is written.
+    """
+    return {'run_id': uuid.uuid4().hex[:12], 'path': path, 'meta': dict(meta or {}), 'stages': []}
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process so far, in MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def text_bytes(texts: Sequence) -> int:
+    """
+    UTF-8 size of the string values in `texts`.
+    """
+    return sum(len(text.encode('utf-8')) for text in texts if isinstance(text, str))
+
+
+def record_latencies(record: dict, seconds: Sequence[float], keys: Optional[Sequence] = None) -> None:
+    """
+    Attach per-row latencies (and row ids, e.g. the 'file' column) to a stage record.
+    """
+    record['latencies'] = np.asarray(seconds, dtype=np.float64)
+    record['keys'] = list(keys) if keys is not None else list(range(len(seconds)))
+
+
+@contextmanager
+def stage(run: dict, name: str, rows: int = 0, nbytes: int = 0, tokens: int = 0) -> Iterator[dict]:
+    """
+    Time one pipeline stage. Yields a record whose 'rows', 'bytes' and
+    'tokens' may be filled in during the stage (and per-row latencies added
+    with record_latencies). On exit, rates, latency percentiles, the slowest
+    rows and peak RSS are computed, appended to run['stages'], logged and
+    written as a JSON line to the run's metrics file. A stage that raises is
+    still recorded, with the exception in 'error' (None otherwise).
+    """
+    record = {'rows': rows, 'bytes': nbytes, 'tokens': tokens}
+    error = None
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _finish_stage(run, name, record, time.perf_counter() - start, error)
+
+
+def _finish_stage(run: dict, name: str, record: dict, seconds: float, error: Optional[str]) -> None:
+    """
+    Build, store, log and write the result of a stage timed by stage().
+    """
+    result = {
+        'run_id': run['run_id'], **run.get('meta', {}), 'stage': name, 'seconds': round(seconds, 4),
+        'rows': record['rows'], 'bytes': record['bytes'], 'tokens': record['tokens'],
+        'rows_per_sec': record['rows'] / seconds if seconds else None,
+        'bytes_per_sec': record['bytes'] / seconds if seconds and record['bytes'] else None,
+        'tokens_per_sec': record['tokens'] / seconds if seconds and record['tokens'] else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'error': error,
+    }
+    latencies = record.get('latencies')
+    if latencies is not None and len(latencies):
+        for q, value in zip(LATENCY_PERCENTILES, np.percentile(latencies, LATENCY_PERCENTILES)):
+            result[f"p{q}_ms"] = round(float(value) * 1000, 3)
+        slowest = np.argsort(latencies)[::-1][:SLOWEST_ROWS]
+        result['slowest'] = [[str(record['keys'][i]), round(float(latencies[i]) * 1000, 3)] for i in slowest]
+
+    run['stages'].append(result)
+    if error is None:
+        logging.info(f"Stage {name}: {result['rows']:,} rows in {seconds:.2f}s, "
+                     f"peak RSS {result['peak_rss_mb']:,} MiB")
+    else:
+        logging.error(f"Stage {name} failed after {seconds:.2f}s ({error}), peak RSS {result['peak_rss_mb']:,} MiB")
+    if run['path']:
+        with open(run['path'], 'a', encoding='utf-8') as fh:
+            fh.write(json.dumps(result) + '\n')
+
+
+def summary_table(run: dict) -> str:
+    """
+    Plain-text table of every finished stage in `run`, plus each stage's share of wall-clock time.
+    """
+    total = sum(s['seconds'] for s in run['stages']) or 1.0
+    rate = lambda value, scale=1: f"{value / scale:,.1f}" if value else '-'
+    width = max([10] + [len(s['stage']) + 2 for s in run['stages']])
+    lines = [f"{'stage':<{width}}{'seconds':>9}{'share':>7}{'rows/s':>12}{'MB/s':>9}{'tokens/s':>11}"
+             f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'RSS MiB':>9}"]
+    for s in run['stages']:
+        lines.append(
+            f"{s['stage']:<{width}}{s['seconds']:>9.2f}{s['seconds'] / total:>7.0%}{rate(s['rows_per_sec']):>12}"
+            f"{rate(s['bytes_per_sec'], 1e6):>9}{rate(s['tokens_per_sec']):>11}"
+            f"{s.get('p50_ms', '-'):>9}{s.get('p95_ms', '-'):>9}{s.get('p99_ms', '-'):>9}{s['peak_rss_mb']:>9,}"
+        )
+    for s in run['stages']:
+        if s.get('slowest'):
+            rows = ', '.join(f"{key} ({ms:,.1f} ms)" for key, ms in s['slowest'])
+            lines.append(f"slowest {s['stage']}: {rows}")
+    return '\n'.join(lines)
+
+
+def report(run: dict) -> str:
+    """
+    Print and log the summary table of a finished run.
+    """
+    table = summary_table(run)
+    print(table)
+    logging.info(f"Stage metrics for run {run['run_id']}:\n{table}")
+    return table
@@ -0,0 +1,136 @@
+import os
+import sys
+import hashlib
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Sequence
+import numpy as np
+import pandas as pd
+from email_parser import HEADERS_ORDER, PARSER_VERSION, parse_series
+from loader import iter_dataset
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+CACHE_DIR = ".cache"
+# One Parquet row group per loader chunk
+ROW_GROUP_SIZE = 50_000
+CACHE_COLUMNS = ['file', 'Headers', *HEADERS_ORDER, 'Body']
+
+
+def source_fingerprint(path) -> str:
+    """
+    Content hash of the source CSV; any edit to the file yields a new cache key.
+    """
+    stat = os.stat(path)
+    return _hash_file(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=None)
+def _hash_file(path: str, size: int, mtime_ns: int) -> str:
+    """
+    Hash file contents; memoized per (path, size, mtime) so a run hashes once.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(8 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_file(source, cache_dir: str = CACHE_DIR) -> Path:
+    """
+    Path of the parsed cache for `source`, keyed by content hash and parser version.
+    """
+    source = Path(source)
+    return Path(cache_dir) / f"{source.stem}.{source_fingerprint(source)}.v{PARSER_VERSION}.parquet"
+
+
+def build_cache(source, cache_dir: str = CACHE_DIR) -> Path:
+    """
+    Stream `source` through the parser and write the parsed columns to a
+    zstd-compressed Parquet file, one row group per chunk. Returns the cache path.
+    Rows keep the source order, so row ids match positions in the CSV.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = cache_file(source, cache_dir)
+    if path.is_file():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    schema = pa.schema([(col, pa.string()) for col in CACHE_COLUMNS])
+
+    rows = 0
+    try:
+        with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+            for chunk in iter_dataset(source, chunksize=ROW_GROUP_SIZE):
+                parsed = parse_series(chunk['message'], fields=HEADERS_ORDER, files=chunk['file'])
+                table = pa.Table.from_pandas(parsed[CACHE_COLUMNS], schema=schema, preserve_index=False)
+                writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+                rows += len(parsed)
+    except BaseException:
+        # An interrupted build leaves no half-written file next to the cache
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
+    logging.info(f"Built parsed cache {path} ({rows:,} rows)")
+    return path
+
+
+def load_parsed(source, columns: Optional[Sequence[str]] = None, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    Read only `columns` of the parsed corpus for `source`, building the cache
+    on first use. The file is memory-mapped; the index is the source row id.
+    """
+    import pyarrow.parquet as pq
+
+    path = build_cache(source, cache_dir)
+    df = pq.read_table(path, columns=list(columns) if columns else None, memory_map=True).to_pandas()
+    logging.info(f"Loaded {len(df):,} rows of {list(df.columns)} from {path}")
+    return df
+
+
+def read_rows(source, rows: Sequence[int], columns: Optional[Sequence[str]] = None,
+              cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    Materialize selected source row ids, decoding only the row groups that
+    contain them. Returns rows in ascending id order, indexed by row id.
+    """
+    import pyarrow.parquet as pq
+
+    path = build_cache(source, cache_dir)
+    pf = pq.ParquetFile(path, memory_map=True)
+    sizes = np.array([pf.metadata.row_group(i).num_rows for i in range(pf.num_row_groups)], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    rows = np.unique(np.asarray(rows, dtype=np.int64))
+    if len(rows) == 0:
+        return pd.DataFrame(columns=list(columns) if columns else CACHE_COLUMNS)
+    row_groups = np.searchsorted(starts, rows, side='right') - 1
+    groups = np.unique(row_groups)
+    # Offset of each selected group within the concatenated read
+    bases = np.concatenate(([0], np.cumsum(sizes[groups])[:-1]))
+    local = bases[np.searchsorted(groups, row_groups)] + (rows - starts[row_groups])
+
+    table = pf.read_row_groups(groups.tolist(), columns=list(columns) if columns else None)
+    df = table.take(local).to_pandas()
+    df.index = rows
+    return df
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else "emails.csv"
+    path = build_cache(source)
+    print(f"Done. Parsed cache at {path}")
+
+
+if __name__ == '__main__':
+    main()
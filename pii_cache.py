@@ -0,0 +1,150 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Default size cap for the cache (sum of stored entity JSON), in bytes
+DEFAULT_MAX_BYTES = 2 << 30
+# After eviction the cache is trimmed to this share of the cap
+EVICT_TO = 0.9
+# Keys per SQLite IN (...) query
+LOOKUP_CHUNK = 500
+
+
+def text_key(text: str, model_id: str) -> bytes:
+    """
+    Content address of a text for a given model identity. Texts are hashed
+    exactly as passed (bodies are already normalized by clean_dataframe);
+    any further normalization here would shift the cached entity offsets.
+    """
+    return hashlib.blake2b(f"{model_id}\0{text}".encode('utf-8'), digest_size=16).digest()
+
+
+def open_cache(path: str) -> sqlite3.Connection:
+    """
+    Open (creating if needed) the SQLite PII result cache at `path`.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS pii_cache ("
+        " key BLOB PRIMARY KEY, entities TEXT NOT NULL,"
+        " size INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS pii_cache_last_used ON pii_cache (last_used)")
+    # Running total of `size`, kept by triggers so eviction checks need not scan the table
+    conn.execute("CREATE TABLE IF NOT EXISTS pii_cache_total (total INTEGER NOT NULL)")
+    conn.execute("CREATE TRIGGER IF NOT EXISTS pii_cache_total_insert AFTER INSERT ON pii_cache"
+                 " BEGIN UPDATE pii_cache_total SET total = total + new.size; END")
+    conn.execute("CREATE TRIGGER IF NOT EXISTS pii_cache_total_delete AFTER DELETE ON pii_cache"
+                 " BEGIN UPDATE pii_cache_total SET total = total - old.size; END")
+    conn.execute("CREATE TRIGGER IF NOT EXISTS pii_cache_total_update AFTER UPDATE OF size ON pii_cache"
+                 " BEGIN UPDATE pii_cache_total SET total = total - old.size + new.size; END")
+    if conn.execute("SELECT COUNT(*) FROM pii_cache_total").fetchone()[0] == 0:
+        # New cache, or one written before the total was kept
+        conn.execute("INSERT INTO pii_cache_total SELECT COALESCE(SUM(size), 0) FROM pii_cache")
+    conn.commit()
+    return conn
+
+
+def cache_get(conn: sqlite3.Connection, keys: Sequence[bytes]) -> Dict[bytes, list]:
+    """
+    Look up cached entity lists for `keys`; hits are marked as recently used.
+    """
+    found = {}
+    keys = list(keys)
+    for i in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[i:i + LOOKUP_CHUNK]
+        marks = ','.join('?' * len(chunk))
+        for key, entities in conn.execute(f"SELECT key, entities FROM pii_cache WHERE key IN ({marks})", chunk):
+            found[key] = json.loads(entities)
+    if found:
+        now = time.time_ns()
+        conn.executemany("UPDATE pii_cache SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+        conn.commit()
+    return found
+
+
+def cache_put(conn: sqlite3.Connection, items: Dict[bytes, list], max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+    """
+    Store entity lists by key, then evict least recently used entries if
+    the cache exceeds `max_bytes`.
+    """
+    now = time.time_ns()
+    rows = []
+    for key, entities in items.items():
+        # numpy float32 scores are not JSON serializable
+        payload = json.dumps(entities, default=float)
+        rows.append((key, payload, len(payload), now))
+    # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the total's trigger
+    conn.executemany("INSERT INTO pii_cache VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET"
+                     " entities = excluded.entities, size = excluded.size, last_used = excluded.last_used", rows)
+    conn.commit()
+    evict(conn, max_bytes)
+
+
+def evict(conn: sqlite3.Connection, max_bytes: int) -> int:
+    """
+    Drop least recently used entries until the cache is under EVICT_TO of
+    `max_bytes`. Does nothing while the cache is within the cap. Returns the
+    number of entries removed.
+    """
+    total = conn.execute("SELECT total FROM pii_cache_total").fetchone()[0]
+    if total <= max_bytes:
+        return 0
+    excess = total - int(max_bytes * EVICT_TO)
+    cursor = conn.execute("SELECT key, size FROM pii_cache ORDER BY last_used")
+    doomed = []
+    for key, size in cursor:
+        if excess <= 0:
+            break
+        doomed.append((key,))
+        excess -= size
+    cursor.close()
+    conn.executemany("DELETE FROM pii_cache WHERE key = ?", doomed)
+    conn.commit()
+    removed = len(doomed)
+    logging.info(f"Evicted {removed:,} entries from PII cache ({total:,} bytes over cap {max_bytes:,})")
+    return removed
+
+
+def cached_detect(texts: Sequence[str], detect: Callable[[List[str]], List[list]], model_id: str,
+                  conn: Optional[sqlite3.Connection] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                  stats: Optional[dict] = None) -> List[list]:
+    """
+    Run `detect` only on texts not already known. Repeated texts within the
+    call are detected once; with `conn`, results are also looked up in and
+    written back to the persistent cache. Hit rates are logged and, if
+    given, stored in `stats`.
+    """
+    results = [[] for _ in texts]
+    positions = {}
+    for i, text in enumerate(texts):
+        if isinstance(text, str) and text.strip():
+            positions.setdefault(text, []).append(i)
+    keys = {text: text_key(text, model_id) for text in positions}
+
+    cached = cache_get(conn, list(keys.values())) if conn is not None else {}
+    misses = [text for text, key in keys.items() if key not in cached]
+    detected = detect(misses) if misses else []
+    if conn is not None and misses:
+        cache_put(conn, {keys[text]: entities for text, entities in zip(misses, detected)}, max_bytes)
+
+    found = {text: cached[key] for text, key in keys.items() if key in cached}
+    found.update(zip(misses, detected))
+    for text, rows in positions.items():
+        results[rows[0]] = found[text]
+        for i in rows[1:]:
+            # Duplicate rows get their own list, so editing one row leaves the others alone
+            results[i] = list(found[text])
+
+    total_rows = sum(len(rows) for rows in positions.values())
+    hit_rate = (total_rows - len(misses)) / total_rows if total_rows else 0.0
+    logging.info(f"PII cache: {len(cached):,} stored hits, {total_rows - len(positions):,} in-run duplicates, "
+                 f"{len(misses):,} texts sent to the model ({hit_rate:.1%} of rows served without inference)")
+    if stats is not None:
+        stats.update(cache_hits=len(cached), duplicate_rows=total_rows - len(positions),
+                     model_texts=len(misses), cache_hit_rate=hit_rate)
+    return results
@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pii_store import entities_to_arrow
+
+# Rows per checkpoint shard in identify_pii
+DEFAULT_CHECKPOINT_ROWS = 10_000
+# Append-only progress journal: one JSON line per completed shard
+JOURNAL_NAME = "journal.jsonl"
+
+
+def shard_digest(texts: Sequence, config: str) -> str:
+    """
+    Fingerprint of a shard's input texts and the detection settings, so a
+    checkpoint is only reused for the same rows processed the same way.
+    """
+    digest = hashlib.blake2b(config.encode('utf-8'), digest_size=16)
+    for text in texts:
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8') if isinstance(text, str) else b'\1')
+    return digest.hexdigest()
+
+
+def shard_path(checkpoint_dir, shard: int) -> Path:
+    """
+    Parquet file holding one shard's entity lists.
+    """
+    return Path(checkpoint_dir) / f"shard-{shard:06d}.parquet"
+
+
+def load_journal(checkpoint_dir) -> Dict[int, dict]:
+    """
+    Completed shards recorded in the journal, by shard number. A torn final
+    line (from a kill mid-write) is ignored, as are shards whose file is gone.
+    """
+    path = Path(checkpoint_dir) / JOURNAL_NAME
+    done = {}
+    if not path.is_file():
+        return done
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Ignoring incomplete journal line in {path}")
+                continue
+            if shard_path(checkpoint_dir, record['shard']).is_file():
+                done[record['shard']] = record
+    return done
+
+
+def save_shard(checkpoint_dir, shard: int, entities: List[list], record: dict) -> None:
+    """
+    Durably write one shard's entities, then append its journal record. The
+    shard file is fsynced and renamed into place before the journal line is
+    written, so a journal entry always points at a complete file.
+    """
+    path = shard_path(checkpoint_dir, shard)
+    tmp_path = path.with_suffix('.tmp')
+    pq.write_table(pa.table({'pii_entities': entities_to_arrow(entities)}), tmp_path)
+    with open(tmp_path, 'rb') as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+    with open(Path(checkpoint_dir) / JOURNAL_NAME, 'a', encoding='utf-8') as fh:
+        fh.write(json.dumps(dict(record, shard=shard, finished=time.time())) + '\n')
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def load_shard(checkpoint_dir, shard: int) -> List[list]:
+    """
+    Entity lists of a completed shard, one per row.
+    """
+    return pq.read_table(shard_path(checkpoint_dir, shard)).column('pii_entities').to_pylist()
+
+
+def run_checkpointed(texts: Sequence, detect: Callable[[List], List[list]], checkpoint_dir,
+                     config: str, shard_rows: int = DEFAULT_CHECKPOINT_ROWS,
+                     stats: Optional[dict] = None) -> List[list]:
+    """
+    Run `detect` over `texts` in shards of `shard_rows` rows, checkpointing
+    each finished shard to `checkpoint_dir` (see save_shard). Shards already
+    in the journal with a matching digest are loaded instead of re-run, so a
+    restarted run continues where the last one stopped; a shard whose rows
+    or `config` changed is recomputed.
+    """
+    Path(checkpoint_dir).mkdir(parents=True, exist_ok=True)
+    done = load_journal(checkpoint_dir)
+    texts = list(texts)
+    n_shards = (len(texts) + shard_rows - 1) // shard_rows
+
+    results = []
+    resumed = 0
+    for shard in range(n_shards):
+        start = shard * shard_rows
+        chunk = texts[start:start + shard_rows]
+        digest = shard_digest(chunk, config)
+        record = done.get(shard)
+        if record is not None and record.get('digest') == digest:
+            results.extend(load_shard(checkpoint_dir, shard))
+            resumed += 1
+            continue
+        if record is not None:
+            logging.warning(f"Checkpoint shard {shard} does not match current input or settings; recomputing")
+
+        entities = detect(chunk)
+        save_shard(checkpoint_dir, shard, entities,
+                   {'rows': [start, start + len(chunk)], 'digest': digest})
+        results.extend(entities)
+        log_msg = f"Checkpointed shard {shard + 1} of {n_shards} (rows up to {start + len(chunk):,})"
+        print(log_msg)
+        logging.info(log_msg)
+
+    if resumed:
+        logging.info(f"Resumed {resumed} of {n_shards} shards from checkpoint {checkpoint_dir}")
+    if stats is not None:
+        stats.update(checkpoint_shards=n_shards, resumed_shards=resumed)
+    return results
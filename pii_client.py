@@ -0,0 +1,104 @@
+import json
+import socket
+import struct
+import logging
+from pathlib import Path
+from typing import List, Optional, Sequence
+from parsed_cache import CACHE_DIR
+
+# Default Unix socket of the PII inference server (see pii_server)
+DEFAULT_SOCKET = str(Path(CACHE_DIR) / "pii_server.sock")
+# Each message is a 4-byte big-endian length followed by that many bytes of JSON
+HEADER = struct.Struct('>I')
+# Seconds to wait for connecting and for the ping reply; a stuck server falls back to the in-process model
+CONNECT_TIMEOUT = 5.0
+# Seconds to wait for any read or write of a detect request (one batch of inference on a busy server)
+REQUEST_TIMEOUT = 600.0
+
+
+def send_message(sock: socket.socket, message: dict) -> None:
+    """
+    Write one length-prefixed JSON message.
+    """
+    # numpy float32 scores are not JSON serializable
+    payload = json.dumps(message, default=float).encode('utf-8')
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> Optional[bytes]:
+    chunks = []
+    while n:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Optional[dict]:
+    """
+    Read one length-prefixed JSON message, or None if the peer closed the connection.
+    """
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    payload = _recv_exact(sock, HEADER.unpack(header)[0])
+    if payload is None:
+        return None
+    return json.loads(payload)
+
+
+class PIIServerClient:
+    """
+    Connection to a running pii_server. detect() has detect_pii's signature
+    minus the pipeline: texts go to the server, which batches them with
+    texts from other clients on its resident model and returns one entity
+    list per text.
+    """
+
+    def __init__(self, address: str = DEFAULT_SOCKET, connect_timeout: float = CONNECT_TIMEOUT,
+                 request_timeout: float = REQUEST_TIMEOUT):
+        self.address = address
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            # Fails at once if no server is listening on the path; a hung one raises socket.timeout,
+            # an OSError, so callers fall back to the in-process model
+            self.sock.settimeout(connect_timeout)
+            self.sock.connect(address)
+            self.model = self._request({'op': 'ping'})['model']
+            self.sock.settimeout(request_timeout)
+        except OSError:
+            self.sock.close()
+            raise
+
+    def _request(self, message: dict) -> dict:
+        send_message(self.sock, message)
+        reply = recv_message(self.sock)
+        if reply is None:
+            raise ConnectionError(f"PII server at {self.address} closed the connection")
+        if 'error' in reply:
+            raise RuntimeError(f"PII server error: {reply['error']}")
+        return reply
+
+    def detect(self, texts: Sequence[str], stats: Optional[dict] = None, **detect_kwargs) -> List[list]:
+        reply = self._request({'op': 'detect', 'texts': list(texts), 'kwargs': detect_kwargs})
+        if stats is not None:
+            stats.update(reply['stats'])
+        return reply['results']
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def connect_pii_server(address: str = DEFAULT_SOCKET) -> Optional[PIIServerClient]:
+    """
+    Client for the server listening on `address`, or None if none is running.
+    """
+    try:
+        client = PIIServerClient(address)
+    except OSError as e:
+        logging.warning(f"No PII server at {address} ({e}); loading the model in-process")
+        return None
+    logging.info(f"Using PII server at {address} ({client.model})")
+    return client
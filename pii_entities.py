@@ -1,12 +1,55 @@
 
 import re
 import os
-import csv
+import bisect
 import sys
+import math
+import time
 import logging
+import itertools
+import multiprocessing
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
 import pandas as pd
+from pii_cache import DEFAULT_MAX_BYTES, cached_detect, open_cache
+from pii_checkpoint import DEFAULT_CHECKPOINT_ROWS, run_checkpointed
+from pii_client import DEFAULT_SOCKET, connect_pii_server
+from pii_onnx import load_onnx_pipeline
+from pii_rules import detect_rules, merge_entities
+from parsed_cache import ROW_GROUP_SIZE, build_cache
+from pii_store import ENTITY_ROW_GROUP_SIZE, ENTITY_TABLE_SCHEMA, entity_table, write_entity_table, write_pii_parquet
+from pii_tokens import TokenArrays, open_token_store, slice_tokens, special_affixes, word_starts
+from quote_segments import detect_segmented, split_segments
 EMAILS_SUBSET_CSV = "emails_100.csv"
+PII_OUTPUT = "emails_with_pii.parquet"
+PII_ENTITIES_OUTPUT = "emails_with_pii_entities.parquet"
+# Entity table of a whole corpus, e.g. emails_pii_entities.parquet for emails.csv (see detect_corpus)
+CORPUS_ENTITIES_SUFFIX = "_pii_entities.parquet"
+# Hugging Face model behind the PII pipeline, and the branch, tag or commit to use (None: 'main');
+# it is resolved to a commit hash that is loaded and keys cached results (see pii_model_revision)
+PII_MODEL = 'ab-ai/pii_model'
+PII_MODEL_REVISION = None
+# A full commit hash, which needs no resolving
+COMMIT_HASH_RE = re.compile(r'[0-9a-f]{40}')
+# Texts per model call in identify_pii
+DEFAULT_BATCH_SIZE = 16
+# Tokens shared by consecutive windows of a long text
+DEFAULT_WINDOW_STRIDE = 128
+# Headroom per window for re-tokenizing the window text on its own
+WINDOW_MARGIN = 8
+# Seconds between progress log lines in detect_pii
+PROGRESS_INTERVAL = 10
+# Attempts at loading the model (hub/network errors are often transient), and base backoff in seconds
+MODEL_LOAD_ATTEMPTS = 3
+MODEL_LOAD_BACKOFF = 5
+
+# Pipeline held by each identify_pii worker process
+_worker_pipe = None
 
 # Configure logging: timestamped entries to 'app.log'
 logging.basicConfig(
@@ -30,6 +73,36 @@ def extract_body(text: str) -> str:
         # fallback: no X-FileName found
         return text.strip()
 
+@lru_cache(maxsize=None)
+def pii_model_revision() -> Optional[str]:
+    """
+    Commit hash of PII_MODEL at PII_MODEL_REVISION: asked of the Hub, or
+    offline read from the local Hugging Face cache refs. None (with a
+    warning) if neither knows it: the model then loads from the branch or
+    tag as given, but its results get no model key (see model_key).
+    Resolved once per process, so a run loads one model version.
+    """
+    ref = PII_MODEL_REVISION or 'main'
+    if COMMIT_HASH_RE.fullmatch(ref):
+        return ref
+    try:
+        from huggingface_hub import HfApi
+        from huggingface_hub.constants import HF_HUB_CACHE
+    except ImportError:
+        logging.error("huggingface_hub library not found. Install with 'pip install huggingface_hub'.")
+        sys.exit(1)
+    try:
+        return HfApi().model_info(PII_MODEL, revision=ref).sha
+    except Exception as e:
+        logging.warning(f"Cannot resolve {PII_MODEL}@{ref} on the Hub ({e}); trying the local cache")
+    refs = Path(HF_HUB_CACHE) / f"models--{PII_MODEL.replace('/', '--')}" / 'refs' / ref
+    try:
+        return refs.read_text().strip()
+    except OSError:
+        logging.warning(f"{PII_MODEL}@{ref} is not in the local cache either; its results cannot be keyed")
+        return None
+
+
 def load_pii_pipeline():
     """
     Initialize Hugging Face PII detection pipeline.
@@ -40,60 +113,692 @@ def load_pii_pipeline():
         logging.error("transformers library not found. Install with 'pip install transformers'.")
         sys.exit(1)
 
-    try:
-        pipe = pipeline(
-            'token-classification',
-            model='ab-ai/pii_model',
-            aggregation_strategy='simple'
-        )
-        logging.info("Loaded PII pipeline: ab-ai/pii_model")
-        return pipe
-    except Exception as e:
-        logging.exception(f"Failed to load PII pipeline: {e}")
-        sys.exit(1)
+    for attempt in range(1, MODEL_LOAD_ATTEMPTS + 1):
+        try:
+            pipe = pipeline(
+                'token-classification',
+                model=PII_MODEL,
+                revision=pii_model_revision(),
+                aggregation_strategy='simple'
+            )
+            logging.info(f"Loaded PII pipeline: {PII_MODEL}@{pii_model_revision() or PII_MODEL_REVISION or 'main'}")
+            return pipe
+        except Exception as e:
+            if attempt == MODEL_LOAD_ATTEMPTS:
+                logging.exception(f"Failed to load PII pipeline: {e}")
+                sys.exit(1)
+            delay = MODEL_LOAD_BACKOFF * 2 ** (attempt - 1)
+            logging.warning(f"Loading PII pipeline failed (attempt {attempt}/{MODEL_LOAD_ATTEMPTS}): {e}; "
+                            f"retrying in {delay}s")
+            time.sleep(delay)
 
 
-def identify_pii(df: pd.DataFrame, text_column: str = 'message') -> pd.DataFrame:
+def load_pii_onnx_pipeline():
     """
-    Detect PII in the specified text column and add 'pii_entities'.
+    PII_MODEL exported to ONNX Runtime (see pii_onnx).
+    """
+    return load_onnx_pipeline(PII_MODEL, pii_model_revision())
+
+
+def load_pii_onnx_int8_pipeline():
+    """
+    PII_MODEL exported to ONNX Runtime with dynamic int8 quantization (see pii_onnx).
+    """
+    return load_onnx_pipeline(PII_MODEL, pii_model_revision(), quantize=True)
+
+
+# Inference backends for identify_pii(backend=...); compare them with pii_parity.py
+PII_BACKENDS = {
+    'eager': load_pii_pipeline,
+    'onnx': load_pii_onnx_pipeline,
+    'onnx-int8': load_pii_onnx_int8_pipeline,
+}
+
+
+def model_key(backend: str = 'eager', loader: Optional[Callable] = None) -> Optional[str]:
+    """
+    Identity of the model behind `backend`, as reported by pii_server and
+    used in identify_pii's cache and checkpoint keys: PII_MODEL@commit hash
+    (see pii_model_revision), plus '/backend' for non-eager backends. A
+    custom `loader` (anything but the backend's own) is keyed by its module
+    and qualified name instead, so e.g. stub results never pass for real ones.
+    None if the commit hash cannot be resolved: a branch name would let
+    results of different commits share keys.
+    """
+    if backend not in PII_BACKENDS:
+        raise ValueError(f"backend must be one of {sorted(PII_BACKENDS)}, not {backend!r}")
+    if loader is not None and loader is not PII_BACKENDS[backend]:
+        return f"{loader.__module__}.{getattr(loader, '__qualname__', repr(loader))}"
+    revision = pii_model_revision()
+    if revision is None:
+        return None
+    key = f"{PII_MODEL}@{revision}"
+    return key if backend == 'eager' else f"{key}/{backend}"
+
+
+def run_batch(pii_pipe, texts: List[str], batch_size: int, row_ids: Sequence[int]) -> List[list]:
+    """
+    Run one batch of texts through the pipeline. If the batch fails, retry
+    its rows one at a time so only the failing row falls back to [].
     """
-    pii_pipe = load_pii_pipeline()
     try:
-        df['pii_entities'] = df[text_column].apply(lambda txt: pii_pipe(txt))
-        logging.info(f"Identified PII in column '{text_column}' for {len(df):,} rows")
-        return df
+        return pii_pipe(texts, batch_size=batch_size)
     except Exception as e:
-        logging.exception(f"Failed to identify PII: {e}")
-        sys.exit(1)
+        logging.warning(f"Batch of {len(texts)} rows failed ({e}); retrying rows individually")
+
+    results = []
+    for idx, text in zip(row_ids, texts):
+        try:
+            results.append(pii_pipe(text))
+        except Exception as e:
+            logging.error(f"Error processing row {idx}: {e}")
+            results.append([])
+    return results
 
-def identify_pii(df: pd.DataFrame, text_column: str = 'message') -> pd.DataFrame:
+
+def run_token_batch(pii_pipe, inputs: List[Tuple[str, np.ndarray, np.ndarray]], batch_size: int,
+                    row_ids: Sequence[int]) -> List[list]:
     """
-    Detect PII in the specified text column and add 'pii_entities' column.
-    Logs progress every 100 records.
+    run_batch for pre-tokenized inputs, given as (text, token ids, offsets
+    into the text) without special tokens. The ids are wrapped in the
+    tokenizer's special tokens, padded into one batch and fed to the model
+    directly; each row's logits then go through the pipeline's own
+    postprocess, so entities come out as on the text path. If the batch
+    fails its texts go through run_batch instead.
     """
-    pii_pipe = load_pii_pipeline()
-    pii_results = []
+    try:
+        import torch
+    except ImportError:
+        logging.error("torch library not found. Install with 'pip install torch'.")
+        sys.exit(1)
+    # Same aggregation as load_pii_pipeline, which the 'simple' in identify_pii's model_id records
+    from transformers.pipelines.token_classification import AggregationStrategy
 
-    for idx, text in enumerate(df[text_column]):
+    tokenizer = pii_pipe.tokenizer
+    prefix, suffix = special_affixes(tokenizer)
+    lengths = [len(prefix) + len(ids) + len(suffix) for _, ids, _ in inputs]
+    input_ids = np.full((len(inputs), max(lengths)), tokenizer.pad_token_id or 0, dtype=np.int64)
+    attention_mask = np.zeros_like(input_ids)
+    for i, ((_, ids, _), n) in enumerate(zip(inputs, lengths)):
+        input_ids[i, :n] = np.concatenate([prefix, ids, suffix])
+        attention_mask[i, :n] = 1
+    try:
+        with torch.no_grad():
+            output = pii_pipe.model(input_ids=torch.from_numpy(input_ids).to(pii_pipe.device),
+                                    attention_mask=torch.from_numpy(attention_mask).to(pii_pipe.device))
+        logits = (output['logits'] if isinstance(output, dict) else output[0]).cpu()
+    except Exception as e:
+        logging.warning(f"Pre-tokenized batch of {len(inputs)} rows failed ({e}); running it from text")
+        return run_batch(pii_pipe, [text for text, _, _ in inputs], batch_size, row_ids)
+
+    results = []
+    for i, ((text, ids, offsets), n) in enumerate(zip(inputs, lengths)):
+        # Special tokens get (0, 0) offsets and are skipped by postprocess
+        special = np.ones((1, n), dtype=np.int64)
+        special[0, len(prefix):len(prefix) + len(ids)] = 0
+        offset_mapping = np.zeros((1, n, 2), dtype=np.int64)
+        offset_mapping[0, len(prefix):len(prefix) + len(ids)] = offsets
         try:
-            result = pii_pipe(text)
+            results.append(pii_pipe.postprocess(
+                [{'logits': logits[i:i + 1, :n], 'input_ids': input_ids[i:i + 1, :n],
+                  'offset_mapping': offset_mapping, 'special_tokens_mask': torch.from_numpy(special),
+                  'sentence': text, 'is_last': True}],
+                aggregation_strategy=AggregationStrategy.SIMPLE))
         except Exception as e:
-            logging.error(f"Error processing row {idx}: {e}")
-            result = []
+            logging.error(f"Error processing row {row_ids[i]}: {e}")
+            results.append([])
+    return results
+
+
+def split_units(pii_pipe, texts: Sequence[str], max_tokens: Optional[int] = None,
+                stride: int = DEFAULT_WINDOW_STRIDE,
+                encodings: Optional[Sequence[Optional[TokenArrays]]] = None) -> List[Tuple[int, int, int, int]]:
+    """
+    Cut texts into model inputs using the pipeline's fast tokenizer. Returns
+    (text position, char start, char end, token count) units: one per text
+    that fits in `max_tokens` (special tokens included), otherwise
+    overlapping windows sharing about `stride` tokens, snapped to word
+    boundaries (ValueError unless 0 <= stride < window size). Without a
+    tokenizer every text is one unit sized in words. Texts with an entry
+    in `encodings` (see pii_tokens) are not tokenized again.
+    """
+    tokenizer = getattr(pii_pipe, 'tokenizer', None)
+    if tokenizer is None:
+        return [(pos, 0, len(text), len(text.split())) for pos, text in enumerate(texts)]
+    if max_tokens is None:
+        # Tokenizers without a limit report a huge sentinel value
+        max_tokens = tokenizer.model_max_length if tokenizer.model_max_length < 100_000 else 512
+    special = tokenizer.num_special_tokens_to_add()
+    window = max(1, max_tokens - special - WINDOW_MARGIN)
+    # A stride of a whole window or more would move each window on by one token
+    if not 0 <= stride < window:
+        raise ValueError(f"stride must be at least 0 and below the window of {window} tokens, not {stride}")
+    encodings = list(encodings) if encodings is not None else [None] * len(texts)
+    missing = [pos for pos, stored in enumerate(encodings) if stored is None]
+    encoded = tokenizer([texts[pos] for pos in missing], add_special_tokens=False, return_offsets_mapping=True,
+                        truncation=False, return_attention_mask=False,
+                        return_token_type_ids=False) if missing else None
+    encoded_pos = {pos: i for i, pos in enumerate(missing)}
+
+    units = []
+    for pos, text in enumerate(texts):
+        stored = encodings[pos]
+        offsets = stored.offsets if stored is not None else encoded['offset_mapping'][encoded_pos[pos]]
+        n = len(offsets)
+        if n + special <= max_tokens:
+            units.append((pos, 0, len(text), n + special))
+            continue
 
-        pii_results.append(result)
+        starts = (stored.word_starts if stored is not None
+                  else word_starts(encoded.word_ids(encoded_pos[pos]))).tolist()
+        start = 0
+        while True:
+            end = min(start + window, n)
+            # Back off so the window does not cut a word in two
+            cut = end
+            while end < n and cut > start + 1 and not starts[cut]:
+                cut -= 1
+            if cut > start + 1:
+                end = cut
+            units.append((pos, int(offsets[start][0]), int(offsets[end - 1][1]), end - start + special))
+            if end >= n:
+                break
+            # Next window starts `stride` tokens back, moved forward to a word start
+            nxt = max(end - stride, start + 1)
+            while nxt < end and not starts[nxt]:
+                nxt += 1
+            start = nxt if nxt < end else max(end - stride, start + 1)
+    return units
 
-        # Log progress every 100 records
-        if (idx + 1) % 100 == 0:
-            log_msg = f"Processed {idx + 1} of {len(df)} records"
+
+def dedupe_overlaps(candidates: List[Tuple[dict, float]]) -> List[dict]:
+    """
+    Merge entities from overlapping windows of one text. `candidates` are
+    (entity, edge distance) pairs, where edge distance is how far the entity
+    sits from a window cut. Of entities whose spans overlap, the one farthest
+    from a cut (then the higher score) is kept.
+    """
+    kept = []
+    for entity, margin in sorted(candidates, key=lambda c: (c[0]['start'], c[0]['end'])):
+        if kept and entity['start'] < kept[-1][0]['end']:
+            if (margin, entity['score']) > (kept[-1][1], kept[-1][0]['score']):
+                kept[-1] = (entity, margin)
+            continue
+        kept.append((entity, margin))
+    return [entity for entity, _ in kept]
+
+
+def plan_batches(lengths: Sequence[int], batch_size: int,
+                 boundaries: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """
+    Group positions into batches of similar length. Without `boundaries`,
+    positions are sorted by length and cut every `batch_size`; with them,
+    positions fall into buckets split at each boundary and are batched in
+    input order within each bucket.
+    """
+    if boundaries is None:
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+        return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+    buckets = {}
+    for pos, length in enumerate(lengths):
+        buckets.setdefault(bisect.bisect_right(boundaries, length), []).append(pos)
+    batches = []
+    for bucket in sorted(buckets):
+        members = buckets[bucket]
+        batches.extend(members[i:i + batch_size] for i in range(0, len(members), batch_size))
+    return batches
+
+
+def padding_efficiency(lengths: Sequence[int], batches: Sequence[Sequence[int]]) -> float:
+    """
+    Share of computed token slots that are real tokens rather than padding:
+    sum of lengths / sum over batches of (longest length * batch size).
+    """
+    padded = sum(max(lengths[p] for p in batch) * len(batch) for batch in batches if batch)
+    return sum(lengths[p] for batch in batches for p in batch) / padded if padded else 1.0
+
+
+def stored_encodings(pii_pipe, texts: Sequence[str], tokens: str) -> Optional[List[Optional[TokenArrays]]]:
+    """
+    Stored tokenization of each text from the token store at `tokens` (None
+    for texts it lacks), or None if the store cannot be used with this
+    pipeline's tokenizer.
+    """
+    try:
+        store = open_token_store(tokens)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Cannot open token store {tokens} ({e}); tokenizing texts")
+        return None
+    tokenizer = getattr(pii_pipe, 'tokenizer', None)
+    if tokenizer is None or not store.matches(tokenizer):
+        logging.warning(f"Token store {tokens} was built for another tokenizer; tokenizing texts")
+        return None
+    encodings = [store.get(text) for text in texts]
+    hits = sum(stored is not None for stored in encodings)
+    logging.info(f"Token store {tokens}: {hits:,} of {len(texts):,} texts pre-tokenized")
+    return encodings
+
+
+def run_stored_units(pii_pipe, texts: Sequence[str], units: Sequence[Tuple[int, int, int, int]],
+                     encodings: Sequence[Optional[TokenArrays]], batch_size: int,
+                     row_ids: Sequence[int]) -> List[list]:
+    """
+    Run one batch of units (see split_units): units of pre-tokenized texts
+    through run_token_batch, the rest through run_batch. Results are in unit order.
+    """
+    stored = [i for i, unit in enumerate(units) if encodings[unit[0]] is not None]
+    plain = [i for i, unit in enumerate(units) if encodings[unit[0]] is None]
+    results = [[] for _ in units]
+    if stored:
+        inputs = []
+        for i in stored:
+            pos, start, end, _ = units[i]
+            inputs.append((texts[pos][start:end], *slice_tokens(encodings[pos], start, end)))
+        for i, found in zip(stored, run_token_batch(pii_pipe, inputs, batch_size, [row_ids[i] for i in stored])):
+            results[i] = found
+    if plain:
+        found = run_batch(pii_pipe, [texts[units[i][0]][units[i][1]:units[i][2]] for i in plain],
+                          batch_size, [row_ids[i] for i in plain])
+        for i, entities in zip(plain, found):
+            results[i] = entities
+    return results
+
+
+def detect_pii(pii_pipe, texts: Sequence[str], batch_size: int = DEFAULT_BATCH_SIZE,
+               bucket: bool = True, bucket_boundaries: Optional[Sequence[int]] = None,
+               max_tokens: Optional[int] = None, stride: int = DEFAULT_WINDOW_STRIDE,
+               tokens: Optional[str] = None, stats: Optional[dict] = None) -> List[list]:
+    """
+    Return one entity list per text, running the model `batch_size` inputs
+    per call. Empty or non-string texts get [] without a model call.
+    With `tokens` (a token store built for the pipeline's tokenizer, see
+    pii_tokens), stored texts skip tokenization and their token ids go
+    straight to the model (see run_token_batch); other texts run as usual.
+    Texts longer than `max_tokens` are split into overlapping windows (see
+    split_units) that are batched alongside short texts; window entities are
+    shifted back to offsets in the full text and overlaps de-duplicated.
+    With `bucket`, inputs are batched by token length (see plan_batches) to
+    cut padding and results are put back in input order. Padding efficiency
+    of the chosen plan and of plain file order is logged and, if given,
+    stored in `stats`, along with the token count and 'row_seconds': each
+    text's share of model time (batch time split by token count). Logs
+    progress and throughput every PROGRESS_INTERVAL seconds.
+    """
+    results = [[] for _ in texts]
+    todo = [i for i, text in enumerate(texts) if isinstance(text, str) and text.strip()]
+    todo_texts = [texts[i] for i in todo]
+
+    encodings = stored_encodings(pii_pipe, todo_texts, tokens) if tokens and todo else None
+    units = split_units(pii_pipe, todo_texts, max_tokens, stride, encodings) if todo else []
+    lengths = [unit[3] for unit in units]
+    file_order = [list(range(i, min(i + batch_size, len(units)))) for i in range(0, len(units), batch_size)]
+    plan = plan_batches(lengths, batch_size, bucket_boundaries) if bucket else file_order
+    windowed = sum(count > 1 for count in Counter(unit[0] for unit in units).values())
+    efficiency = padding_efficiency(lengths, plan)
+    baseline = padding_efficiency(lengths, file_order)
+    logging.info(f"Padding efficiency {efficiency:.1%} over {len(plan)} batches (file order: {baseline:.1%})")
+    if stats is not None:
+        stats.update(batches=len(plan), inputs=len(units), windowed_texts=windowed, tokens=sum(lengths),
+                     padding_efficiency=efficiency, padding_efficiency_file_order=baseline)
+
+    unit_results = [[] for _ in units]
+    row_seconds = [0.0] * len(texts)
+    done = 0
+    started = last_report = time.perf_counter()
+    for positions in plan:
+        batch_units = [units[p] for p in positions]
+        batch_start = time.perf_counter()
+        if encodings is None:
+            batch = run_batch(pii_pipe, [todo_texts[pos][start:end] for pos, start, end, _ in batch_units],
+                              batch_size, [todo[pos] for pos, _, _, _ in batch_units])
+        else:
+            batch = run_stored_units(pii_pipe, todo_texts, batch_units, encodings, batch_size,
+                                     [todo[pos] for pos, _, _, _ in batch_units])
+        now = time.perf_counter()
+        batch_tokens = sum(unit[3] for unit in batch_units) or 1
+        for p, unit, result in zip(positions, batch_units, batch):
+            unit_results[p] = result
+            row_seconds[todo[unit[0]]] += (now - batch_start) * unit[3] / batch_tokens
+        done += len(positions)
+
+        if now - last_report >= PROGRESS_INTERVAL or done == len(units):
+            log_msg = f"Processed {done} of {len(units)} inputs ({done / (now - started):,.1f} inputs/s)"
             print(log_msg)
             logging.info(log_msg)
+            last_report = now
+    if stats is not None:
+        stats['row_seconds'] = row_seconds
+
+    # Units are in text order; windows of one text are adjacent
+    for pos, group in itertools.groupby(zip(units, unit_results), key=lambda item: item[0][0]):
+        group = list(group)
+        if len(group) == 1:
+            results[todo[pos]] = group[0][1]
+            continue
+        text_len = len(todo_texts[pos])
+        candidates = []
+        for (_, start, end, _), entities in group:
+            for entity in entities:
+                entity = dict(entity, start=entity['start'] + start, end=entity['end'] + start)
+                left = entity['start'] - start if start > 0 else math.inf
+                right = end - entity['end'] if end < text_len else math.inf
+                candidates.append((entity, min(left, right)))
+        results[todo[pos]] = dedupe_overlaps(candidates)
+    return results
 
-    df['pii_entities'] = pii_results
+
+def _init_worker(threads: int, loader: Callable) -> None:
+    """
+    Pool initializer: cap this worker's intra-op threads, then load the
+    pipeline once and keep it for every shard the worker processes.
+    """
+    global _worker_pipe
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_pipe = loader()
+
+
+def _detect_shard(texts: List[str], detect_kwargs: dict) -> Tuple[List[list], dict]:
+    """
+    Run detect_pii on one shard with the worker's resident pipeline.
+    """
+    stats = {}
+    return detect_pii(_worker_pipe, texts, stats=stats, **detect_kwargs), stats
+
+
+def _worker_threads(workers: int, threads_per_worker: Optional[int] = None) -> int:
+    """
+    Intra-op threads per worker: `threads_per_worker`, or cores divided
+    evenly between workers so they do not oversubscribe the CPU.
+    """
+    return threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+
+
+def start_worker_pool(workers: int, threads_per_worker: Optional[int] = None,
+                      loader: Callable = load_pii_pipeline) -> ProcessPoolExecutor:
+    """
+    Pool of `workers` processes for detect_pii_sharded. Each worker loads the
+    pipeline once via `loader` when it starts and keeps it until the pool is
+    shut down, so a pool can serve many detect_pii_sharded calls.
+    """
+    # spawn, not fork: forking a process that has initialised torch threads can deadlock
+    ctx = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                               initargs=(_worker_threads(workers, threads_per_worker), loader))
+
+
+def detect_pii_sharded(texts: Sequence[str], workers: int, threads_per_worker: Optional[int] = None,
+                       shard_size: Optional[int] = None, loader: Callable = load_pii_pipeline,
+                       stats: Optional[dict] = None, pool: Optional[ProcessPoolExecutor] = None,
+                       **detect_kwargs) -> List[list]:
+    """
+    detect_pii across a pool of `workers` processes. Texts are cut into
+    contiguous shards (several per worker so fast workers pick up slack) and
+    results are merged back in input order. Each worker loads the pipeline
+    once via `loader` and uses `threads_per_worker` threads (default: cores
+    divided evenly between workers) so workers do not oversubscribe the CPU.
+    A `pool` from start_worker_pool is used as is and left running;
+    otherwise one is started for this call and shut down after it.
+    """
+    texts = list(texts)
+    threads = _worker_threads(workers, threads_per_worker)
+    shard_size = shard_size or max(1, math.ceil(len(texts) / (workers * 4)))
+    shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+    logging.info(f"Sharding {len(texts):,} texts into {len(shards)} shards over {workers} workers "
+                 f"({threads} threads each)")
+
+    results = []
+    shard_stats = []
+    own_pool = pool is None
+    if own_pool:
+        pool = start_worker_pool(workers, threads, loader)
+    try:
+        for shard_results, shard_stat in pool.map(_detect_shard, shards, itertools.repeat(detect_kwargs)):
+            results.extend(shard_results)
+            shard_stats.append((len(shard_results), shard_stat))
+            log_msg = f"Processed {len(results)} of {len(texts)} records"
+            print(log_msg)
+            logging.info(log_msg)
+    except BrokenProcessPool as e:
+        logging.exception(f"PII worker pool failed: {e}")
+        sys.exit(1)
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    if stats is not None and shard_stats:
+        # Efficiency is real tokens over padded slots, so shards are combined by their slot counts
+        tokens = sum(s.get('tokens', 0) for _, s in shard_stats)
+        slots = sum(s.get('tokens', 0) / s.get('padding_efficiency', 1.0) for _, s in shard_stats
+                    if s.get('padding_efficiency'))
+        slots_file_order = sum(s.get('tokens', 0) / s.get('padding_efficiency_file_order', 1.0)
+                               for _, s in shard_stats if s.get('padding_efficiency_file_order'))
+        stats.update(
+            shards=len(shards), workers=workers, threads_per_worker=threads,
+            batches=sum(s.get('batches', 0) for _, s in shard_stats),
+            inputs=sum(s.get('inputs', 0) for _, s in shard_stats),
+            tokens=tokens,
+            row_seconds=[t for _, s in shard_stats for t in s.get('row_seconds', [])],
+            windowed_texts=sum(s.get('windowed_texts', 0) for _, s in shard_stats),
+            padding_efficiency=tokens / slots if slots else 1.0,
+            padding_efficiency_file_order=tokens / slots_file_order if slots_file_order else 1.0,
+        )
+    return results
+
+
+def identify_pii(df: pd.DataFrame, text_column: str = 'message',
+                 batch_size: int = DEFAULT_BATCH_SIZE, bucket: bool = True,
+                 bucket_boundaries: Optional[Sequence[int]] = None,
+                 max_tokens: Optional[int] = None, stride: int = DEFAULT_WINDOW_STRIDE,
+                 workers: int = 1, threads_per_worker: Optional[int] = None,
+                 cache_path: Optional[str] = None, cache_max_bytes: int = DEFAULT_MAX_BYTES,
+                 segment_quotes: bool = False, rules: str = 'off',
+                 checkpoint_dir: Optional[str] = None,
+                 checkpoint_rows: int = DEFAULT_CHECKPOINT_ROWS,
+                 row_seconds: Optional[List[float]] = None,
+                 loader: Optional[Callable] = None,
+                 server: Optional[str] = None, backend: str = 'eager',
+                 tokens: Optional[str] = None, loaded: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Detect PII in the specified text column and add 'pii_entities' column.
+    Texts are sent to the model in length-bucketed batches of `batch_size`,
+    with texts over `max_tokens` split into overlapping windows; batching
+    stats (incl. padding efficiency) are kept in df.attrs['pii_stats'].
+    With `workers` > 1 the column is sharded over a process pool
+    (see detect_pii_sharded). Each distinct text is run once; with
+    `cache_path`, results persist in a SQLite cache (see pii_cache) keyed by
+    text, model and windowing settings, capped at `cache_max_bytes`.
+    With `segment_quotes`, bodies are split into authored and quoted or
+    forwarded segments (see quote_segments) and each distinct segment is
+    detected once, with entities mapped back into every body containing it.
+    `rules` controls the regex detectors for structured PII (see pii_rules):
+    'off', 'merge' (combined with model output, overlaps resolved) or
+    'only' (no model is loaded).
+    With `checkpoint_dir`, rows are processed in shards of `checkpoint_rows`
+    that are saved as they finish (see pii_checkpoint); rerunning with the
+    same directory skips completed shards and gives the same output.
+    If `row_seconds` is given, each row's share of model time is appended to
+    it (0 for rows served from cache or rules only).
+    `backend` picks the pipeline from PII_BACKENDS ('eager', 'onnx' or
+    'onnx-int8'; non-eager backends get their own cache keys) unless
+    `loader` builds it instead (e.g. pii_stub.load_stub_pipeline offline).
+    With `server` (a socket path, see pii_server), texts are sent to a
+    running inference server instead of loading the model here; if none is
+    listening, it runs a different model (see model_key) or it fails
+    mid-run, detection falls back to `loader`; results from either side
+    carry the same model key. If the model's commit cannot be resolved,
+    the cache, checkpoints and server are not used; `rules='only'` never
+    resolves or loads the model.
+    `tokens` is a token store of the column built once by pii_tokens
+    (e.g. pretokenize_csv); texts found in it are not tokenized again.
+    `loaded` keeps the pipeline ('pipe') and worker pool ('pool') once they
+    are loaded, so repeated calls with the same model settings load them
+    once (see detect_corpus); the caller then shuts down loaded['pool'].
+    Without it both last for this call only.
+    """
+    if rules not in ('off', 'merge', 'only'):
+        raise ValueError(f"rules must be 'off', 'merge' or 'only', not {rules!r}")
+    if backend not in PII_BACKENDS:
+        raise ValueError(f"backend must be one of {sorted(PII_BACKENDS)}, not {backend!r}")
+    if rules == 'only':
+        # No model is loaded or resolved; rules alone key the checkpoints
+        model = None
+        model_id = 'rules-only'
+    else:
+        # Server and in-process results share cache/checkpoint keys, so both must run this model
+        model = model_key(backend, loader)
+        model_id = f"{model}|simple|{max_tokens}|{stride}" if model is not None else None
+        if model is None and (cache_path or checkpoint_dir or server):
+            logging.warning(f"{PII_MODEL} is not pinned to a commit; running without the result cache, "
+                            f"checkpoints and PII server, which would mix results of different commits")
+            cache_path = checkpoint_dir = server = None
+    loader = loader or PII_BACKENDS[backend]
+    texts = df[text_column].tolist()
+    stats = {}
+    detect_kwargs = dict(batch_size=batch_size, bucket=bucket, bucket_boundaries=bucket_boundaries,
+                         max_tokens=max_tokens, stride=stride, tokens=tokens)
+    own_loaded = loaded is None
+    loaded = {} if own_loaded else loaded
+    text_seconds = {}
+    client = connect_pii_server(server) if server and rules != 'only' else None
+    if client is not None and client.model != model:
+        logging.warning(f"PII server at {server} runs {client.model}, not {model}; loading the model in-process")
+        client.close()
+        client = None
+
+    def detect(batch: List[str]) -> List[list]:
+        nonlocal client
+        if client is not None:
+            try:
+                found = client.detect(batch, stats=stats, **detect_kwargs)
+                text_seconds.update(zip(batch, stats.pop('row_seconds', [])))
+                return found
+            except (OSError, RuntimeError) as e:
+                logging.warning(f"PII server request failed ({e}); loading the model in-process")
+                client.close()
+                client = None
+        # The pipeline or worker pool is loaded on first use and kept across checkpoint shards
+        if workers > 1:
+            if 'pool' not in loaded:
+                loaded['pool'] = start_worker_pool(workers, threads_per_worker, loader)
+            found = detect_pii_sharded(batch, workers, threads_per_worker, loader=loader, stats=stats,
+                                       pool=loaded['pool'], **detect_kwargs)
+        else:
+            if 'pipe' not in loaded:
+                loaded['pipe'] = loader()
+            found = detect_pii(loaded['pipe'], batch, stats=stats, **detect_kwargs)
+        text_seconds.update(zip(batch, stats.pop('row_seconds', [])))
+        return found
+
+    def run(chunk: List[str]) -> List[list]:
+        if rules == 'only':
+            return detect_rules(chunk)
+        conn = open_cache(cache_path) if cache_path else None
+        try:
+            if segment_quotes:
+                found = detect_segmented(
+                    chunk, lambda segments: cached_detect(segments, detect, model_id, conn, cache_max_bytes, stats),
+                    stats)
+            else:
+                found = cached_detect(chunk, detect, model_id, conn, cache_max_bytes, stats)
+        finally:
+            if conn is not None:
+                conn.close()
+        if rules == 'merge':
+            found = [merge_entities(model, matched) for model, matched in zip(found, detect_rules(chunk))]
+        return found
+
+    try:
+        if checkpoint_dir:
+            config = f"{model_id}|rules={rules}|segment_quotes={segment_quotes}"
+            results = run_checkpointed(texts, run, checkpoint_dir, config, checkpoint_rows, stats)
+        else:
+            results = run(texts)
+    finally:
+        if own_loaded and 'pool' in loaded:
+            loaded['pool'].shutdown()
+        if client is not None:
+            client.close()
+    if row_seconds is not None:
+        for text in texts:
+            if not isinstance(text, str):
+                row_seconds.append(0.0)
+            elif segment_quotes:
+                row_seconds.append(sum(text_seconds.get(text[start:end], 0.0) for start, end in split_segments(text)))
+            else:
+                row_seconds.append(text_seconds.get(text, 0.0))
+    df['pii_entities'] = results
+    df.attrs['pii_stats'] = stats
     logging.info(f"Finished processing PII for {len(df):,} records.")
     return df
 
+def corpus_entities_path(source) -> Path:
+    """
+    Default entity table of detect_corpus for `source`, in the working directory.
+    """
+    return Path(Path(source).stem + CORPUS_ENTITIES_SUFFIX)
+
+
+def detect_corpus(source, out_path=None, batch_size: int = ROW_GROUP_SIZE, **pii_kwargs) -> dict:
+    """
+    Detect PII in the parsed 'Body' of every row of `source` (see
+    parsed_cache), batch by batch, and write the flat entity table to
+    `out_path` (default corpus_entities_path). Entities are keyed by source
+    row id and carry the digest of their body, which is the text
+    anonymize.py rewrites. `pii_kwargs` go to identify_pii; the pipeline or
+    worker pool is loaded once and shared by all batches. Returns row and
+    entity counts.
+    """
+    import pyarrow.parquet as pq
+
+    out_path = out_path or corpus_entities_path(source)
+    pf = pq.ParquetFile(build_cache(source), memory_map=True)
+    counts = {'rows': 0, 'entities': 0}
+    loaded = {}
+    tmp_path = Path(out_path).with_name(Path(out_path).name + '.tmp')
+    try:
+        with pq.ParquetWriter(tmp_path, ENTITY_TABLE_SCHEMA, compression='zstd') as writer:
+            for batch in pf.iter_batches(batch_size=batch_size, columns=['Body']):
+                # Indexed by source row id, which entity_table keys the entities by
+                df = pd.DataFrame({'Body': batch.column('Body').to_pylist()},
+                                  index=pd.RangeIndex(counts['rows'], counts['rows'] + batch.num_rows))
+                identify_pii(df, text_column='Body', loaded=loaded, **pii_kwargs)
+                table = entity_table(df, text_column='Body').sort_by([('row_id', 'ascending'), ('start', 'ascending')])
+                writer.write_table(table, row_group_size=ENTITY_ROW_GROUP_SIZE)
+                counts['rows'] += len(df)
+                counts['entities'] += table.num_rows
+                log_msg = f"Detected PII in {counts['rows']:,} of {pf.metadata.num_rows:,} records"
+                print(log_msg)
+                logging.info(log_msg)
+    except BaseException:
+        # No partial table is left behind for later stages to trust
+        tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        if 'pool' in loaded:
+            loaded['pool'].shutdown()
+    os.replace(tmp_path, out_path)
+    logging.info(f"Saved {counts['entities']:,} entities for {counts['rows']:,} rows of {source} to {out_path}")
+    return counts
+
+
 def main():
+    # pii_entities.py <corpus.csv>: entity table of the whole corpus, for anonymize.py
+    if len(sys.argv) > 1:
+        try:
+            detect_corpus(sys.argv[1], server=DEFAULT_SOCKET)
+        except FileNotFoundError as e:
+            logging.error(f"Input not found: {e}")
+            sys.exit(1)
+        print(f"Done. Entity table saved to {corpus_entities_path(sys.argv[1])}")
+        return
+
     # 1. Load the subset CSV
     try:
         emails_df = pd.read_csv(EMAILS_SUBSET_CSV, encoding="utf-8")
@@ -105,17 +810,18 @@ def main():
     # new column "body" with only the content after X-FileName
     emails_df['body'] = emails_df['message'].apply(extract_body)
 
-    # Identify PII in the 'message' column
-    pii_df = identify_pii(emails_df, text_column='body')
+    # Identify PII in the 'message' column (on a warm pii_server if one is running)
+    pii_df = identify_pii(emails_df, text_column='body', server=DEFAULT_SOCKET)
 
     # Preview results
     print("pii top 5 rows")
     print(pii_df[['body', 'pii_entities']].head())
 
-    # Save to CSV
-    print("create pii csv")
-    pii_df.to_csv("emails_with_pii.csv", index=False, encoding="utf-8")
-    print("Processed PII data saved to 'emails_with_pii.csv'.")
+    # Save with typed entities, plus a flat one-row-per-entity table
+    print("create pii parquet")
+    write_pii_parquet(pii_df, PII_OUTPUT)
+    write_entity_table(pii_df, PII_ENTITIES_OUTPUT, text_column='body')
+    print(f"Processed PII data saved to '{PII_OUTPUT}' and '{PII_ENTITIES_OUTPUT}'.")
 
 if __name__ == "__main__":
     main()
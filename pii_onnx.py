@@ -0,0 +1,94 @@
+import sys
+import time
+import platform
+import logging
+from pathlib import Path
+from typing import Optional
+from parsed_cache import CACHE_DIR
+
+# Exported (and quantized) models are kept here, one directory per model revision
+ONNX_DIR = Path(CACHE_DIR) / "onnx"
+ONNX_FILE = "model.onnx"
+INT8_FILE = "model_quantized.onnx"
+
+
+def onnx_dir(model: str, revision: Optional[str]) -> Path:
+    """
+    Export directory for a Hub model id and revision.
+    """
+    return ONNX_DIR / f"{model.replace('/', '--')}@{revision or 'main'}"
+
+
+def _quantization_config():
+    """
+    Dynamic int8 config for this CPU: VNNI kernels when the CPU has them, else AVX2 (ARM64 on ARM).
+    """
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    if platform.machine().lower() in ('arm64', 'aarch64'):
+        return AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    try:
+        flags = Path('/proc/cpuinfo').read_text()
+    except OSError:
+        flags = ''
+    if 'avx512_vnni' in flags:
+        return AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    return AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+
+
+def export_onnx(model: str, revision: Optional[str] = None, quantize: bool = False) -> Path:
+    """
+    Export the token classifier to ONNX (and, with `quantize`, a dynamically
+    int8-quantized copy) under ONNX_DIR, once per model revision. Returns
+    the export directory, which also holds the tokenizer.
+    """
+    try:
+        from optimum.onnxruntime import ORTModelForTokenClassification, ORTQuantizer
+        from transformers import AutoTokenizer
+    except ImportError:
+        logging.error("optimum/onnxruntime not found. Install with 'pip install optimum[onnxruntime]'.")
+        sys.exit(1)
+
+    out_dir = onnx_dir(model, revision)
+    try:
+        if not (out_dir / ONNX_FILE).is_file():
+            start = time.perf_counter()
+            ort_model = ORTModelForTokenClassification.from_pretrained(model, revision=revision, export=True)
+            ort_model.save_pretrained(out_dir)
+            AutoTokenizer.from_pretrained(model, revision=revision).save_pretrained(out_dir)
+            logging.info(f"Exported {model} to {out_dir / ONNX_FILE} in {time.perf_counter() - start:.1f}s")
+        if quantize and not (out_dir / INT8_FILE).is_file():
+            quantizer = ORTQuantizer.from_pretrained(out_dir, file_name=ONNX_FILE)
+            quantizer.quantize(save_dir=out_dir, quantization_config=_quantization_config())
+            logging.info(f"Quantized {model} to int8 at {out_dir / INT8_FILE}")
+    except Exception as e:
+        logging.exception(f"Failed to export {model} to ONNX: {e}")
+        sys.exit(1)
+    return out_dir
+
+
+def load_onnx_pipeline(model: str, revision: Optional[str] = None, quantize: bool = False):
+    """
+    Token-classification pipeline over the ONNX Runtime export of `model`
+    (exported on first use). It is the same transformers pipeline object
+    with aggregation_strategy='simple' as the eager one, so entities come
+    out in the same format and long texts are windowed the same way. ONNX
+    Runtime applies its full graph optimizations when the session loads.
+    """
+    try:
+        from optimum.onnxruntime import ORTModelForTokenClassification
+        from transformers import AutoTokenizer, pipeline
+    except ImportError:
+        logging.error("optimum/onnxruntime not found. Install with 'pip install optimum[onnxruntime]'.")
+        sys.exit(1)
+
+    out_dir = export_onnx(model, revision, quantize)
+    file_name = INT8_FILE if quantize else ONNX_FILE
+    try:
+        ort_model = ORTModelForTokenClassification.from_pretrained(out_dir, file_name=file_name)
+        pipe = pipeline('token-classification', model=ort_model,
+                        tokenizer=AutoTokenizer.from_pretrained(out_dir), aggregation_strategy='simple')
+    except Exception as e:
+        logging.exception(f"Failed to load ONNX pipeline from {out_dir / file_name}: {e}")
+        sys.exit(1)
+    logging.info(f"Loaded ONNX Runtime PII pipeline: {out_dir / file_name}")
+    return pipe
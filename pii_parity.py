@@ -0,0 +1,104 @@
+import sys
+import time
+import logging
+from typing import Callable, Dict, List, Sequence
+import pandas as pd
+from email_parser import parse_series
+from pii_entities import PII_BACKENDS, detect_pii
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# Texts run through each backend before timing starts (session warm-up)
+PARITY_WARMUP = 8
+PARITY_CSV = "emails_100.csv"
+
+
+def entity_agreement(reference: Sequence[list], candidate: Sequence[list]) -> dict:
+    """
+    Entity-level agreement of `candidate` with `reference` (one entity list
+    per text): an entity matches when group, start and end are equal.
+    Returns precision, recall, F1, the share of texts whose entity sets are
+    identical and the largest score difference among matched entities.
+    """
+    matched = found = expected = same_rows = 0
+    max_score_diff = 0.0
+    for ref_entities, cand_entities in zip(reference, candidate):
+        ref = {(e['entity_group'], e['start'], e['end']): float(e['score']) for e in ref_entities}
+        cand = {(e['entity_group'], e['start'], e['end']): float(e['score']) for e in cand_entities}
+        common = ref.keys() & cand.keys()
+        matched += len(common)
+        found += len(cand)
+        expected += len(ref)
+        same_rows += ref.keys() == cand.keys()
+        for key in common:
+            max_score_diff = max(max_score_diff, abs(ref[key] - cand[key]))
+    precision = matched / found if found else 1.0
+    recall = matched / expected if expected else 1.0
+    return {
+        'entities': expected,
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        'identical_rows': same_rows / len(reference) if len(reference) else 1.0,
+        'max_score_diff': max_score_diff,
+    }
+
+
+def parity_check(texts: Sequence[str], loaders: Dict[str, Callable], reference: str = 'eager',
+                 **detect_kwargs) -> List[dict]:
+    """
+    Run the same texts through detect_pii on every backend in `loaders`
+    (name -> pipeline loader) and report, per backend, entity agreement with
+    the `reference` backend (see entity_agreement), seconds, texts/s and
+    speedup over the reference. Each backend is warmed up before timing.
+    """
+    outputs, seconds = {}, {}
+    for name, loader in loaders.items():
+        pipe = loader()
+        detect_pii(pipe, list(texts[:PARITY_WARMUP]), **detect_kwargs)
+        start = time.perf_counter()
+        outputs[name] = detect_pii(pipe, texts, **detect_kwargs)
+        seconds[name] = time.perf_counter() - start
+        logging.info(f"Parity run {name}: {len(texts):,} texts in {seconds[name]:.2f}s")
+        del pipe
+
+    rows = []
+    for name in loaders:
+        row = {'backend': name, **entity_agreement(outputs[reference], outputs[name]),
+               'seconds': seconds[name], 'texts_per_sec': len(texts) / seconds[name] if seconds[name] else 0.0,
+               'speedup': seconds[reference] / seconds[name] if seconds[name] else 0.0}
+        rows.append(row)
+        logging.info(f"Parity {name} vs {reference}: {row}")
+    return rows
+
+
+def print_parity(rows: List[dict]) -> None:
+    print(f"{'backend':<12}{'F1':>8}{'prec':>8}{'recall':>8}{'same rows':>11}{'max dscore':>12}"
+          f"{'texts/s':>10}{'speedup':>9}")
+    for row in rows:
+        print(f"{row['backend']:<12}{row['f1']:>8.4f}{row['precision']:>8.4f}{row['recall']:>8.4f}"
+              f"{row['identical_rows']:>11.1%}{row['max_score_diff']:>12.4f}"
+              f"{row['texts_per_sec']:>10.1f}{row['speedup']:>8.2f}x")
+
+
+def main():
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else PARITY_CSV
+    backends = sys.argv[2:] or list(PII_BACKENDS)
+    try:
+        df = pd.read_csv(csv_path, encoding='utf-8')
+    except FileNotFoundError:
+        logging.error(f"File not found: {csv_path}")
+        sys.exit(1)
+    bodies = parse_series(df['message'])['Body'].tolist()
+    rows = parity_check(bodies, {name: PII_BACKENDS[name] for name in ['eager', *backends] if name in PII_BACKENDS})
+    print_parity(rows)
+
+
+if __name__ == '__main__':
+    main()
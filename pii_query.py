@@ -0,0 +1,90 @@
+import sys
+import logging
+from typing import List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from pii_entities import PII_ENTITIES_OUTPUT
+from pii_store import ENTITY_FIELDS, read_entity_table
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# Minimum scores tried by score_sweep; model scores run from about 0.3 to 0.99
+SWEEP_THRESHOLDS = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99)
+# entity_group of the all-groups totals in score_sweep
+ALL_GROUPS = 'ALL'
+
+
+def entity_lists(entity_df: pd.DataFrame, rows: Sequence[int]) -> List[List[dict]]:
+    """
+    Group a flat entity table into one entity list per row id in `rows`
+    (in that order, [] for rows without entities), sorted by start.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    entity_df = entity_df.sort_values(['row_id', 'start'], kind='stable')
+    row_col = entity_df['row_id'].to_numpy()
+    lo = np.searchsorted(row_col, rows, side='left')
+    hi = np.searchsorted(row_col, rows, side='right')
+    records = entity_df[ENTITY_FIELDS].to_dict('records')
+    return [records[start:end] for start, end in zip(lo.tolist(), hi.tolist())]
+
+
+def query_entities(path, rows: Sequence[int], entity_groups: Optional[Sequence[str]] = None,
+                   min_score: Optional[float] = None) -> List[List[dict]]:
+    """
+    Entities of the given rows from the flat entity table at `path`,
+    keeping only `entity_groups` (all if None) scored at least `min_score`:
+    one list per row, in the format identify_pii produces.
+    """
+    entity_df = read_entity_table(path, entity_groups=entity_groups, min_score=min_score, rows=rows)
+    return entity_lists(entity_df, rows)
+
+
+def score_sweep(path, thresholds: Sequence[float] = SWEEP_THRESHOLDS,
+                entity_groups: Optional[Sequence[str]] = None,
+                rows: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    """
+    What each minimum score would keep, from one read of the entity table
+    at `path`: per entity group (plus ALL_GROUPS) and threshold, the number
+    of entities and of rows with at least one entity scored at or above it.
+    """
+    entity_df = read_entity_table(path, entity_groups=entity_groups, rows=rows,
+                                  columns=['row_id', 'entity_group', 'score'])
+    # Compared at the stored float32 precision, like the score filter of read_entity_table
+    thresholds = sorted(thresholds)
+    levels = np.asarray(thresholds, dtype=np.float32)
+    groups = [(ALL_GROUPS, entity_df)] + list(entity_df.groupby('entity_group', sort=True))
+    out = []
+    for group, frame in groups:
+        # A row is kept at a threshold if its best entity of the group reaches it
+        scores = np.sort(frame['score'].to_numpy(dtype=np.float32))
+        best = np.sort(frame.groupby('row_id')['score'].max().to_numpy(dtype=np.float32))
+        entities = len(scores) - np.searchsorted(scores, levels, side='left')
+        kept_rows = len(best) - np.searchsorted(best, levels, side='left')
+        out.extend({'entity_group': group, 'min_score': t, 'entities': int(e), 'rows': int(r)}
+                   for t, e, r in zip(thresholds, entities, kept_rows))
+    return pd.DataFrame(out, columns=['entity_group', 'min_score', 'entities', 'rows'])
+
+
+def main():
+    # pii_query.py [entities.parquet] [GROUP,GROUP,...]
+    path = sys.argv[1] if len(sys.argv) > 1 else PII_ENTITIES_OUTPUT
+    entity_groups = sys.argv[2].split(',') if len(sys.argv) > 2 else None
+    try:
+        sweep = score_sweep(path, entity_groups=entity_groups)
+    except FileNotFoundError as e:
+        logging.error(f"Entity table not found: {e}")
+        sys.exit(1)
+    logging.info(f"Score sweep over {path} for {len(SWEEP_THRESHOLDS)} thresholds")
+    for values in ('entities', 'rows'):
+        print(f"{values.capitalize()} kept per minimum score:")
+        print(sweep.pivot(index='entity_group', columns='min_score', values=values).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import re
+import logging
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Structured PII patterns, labelled with the PII model's entity groups.
+# None of them can match '\0', which separates texts in detect_rules.
+# Each pattern starts with literals or a narrow character class so the regex
+# engine can skip ahead quickly; left-context checks that would need a
+# leading lookbehind are done per match in SPAN_CHECKS instead.
+RULES: Dict[str, re.Pattern] = {
+    # Domain part only; the local part is recovered by _email_span
+    'EMAIL': re.compile(r'@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}\b'),
+    'URL': re.compile(r'(?:https?://|www\.|HTTPS?://|WWW\.)[^\s<>"\'\0]*[^\s<>"\'\0.,;:!?)\]]'),
+    'SSN': re.compile(r'\d{3}-\d{2}-\d{4}(?![\d-])'),
+    'PHONENUMBER': re.compile(r'(?=[+(\d])(?:\+?1[-. ]?)?(?:\(\d{3}\) ?|\d{3}[-. ])\d{3}[-. ]\d{4}(?![\w-])'),
+    'CREDITCARDNUMBER': re.compile(r'\d(?:[ -]?\d){12,18}(?![\d-])'),
+}
+# Score given to rule matches
+RULE_SCORE = 1.0
+
+EMAIL_LOCAL_RE = re.compile(r'[A-Za-z0-9._%+-]+$')
+SSN_INVALID_RE = re.compile(r'000|666|9\d\d|\d{3}-00|\d{3}-\d{2}-0000')
+
+
+def luhn_valid(number: str) -> bool:
+    """
+    Luhn checksum over the digits of `number` (separators ignored).
+    """
+    digits = [int(c) for c in number if c.isdigit()]
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        if i % 2:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+def _left_bounded(text: str, start: int, chars: str) -> bool:
+    """
+    True if the match at `start` is not preceded by a word character or any of `chars`.
+    """
+    return start == 0 or not (text[start - 1].isalnum() or text[start - 1] in chars)
+
+
+def _email_span(text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+    """
+    Extend an '@domain' match back over the local part (at most 64 chars).
+    """
+    local = EMAIL_LOCAL_RE.search(text, max(0, start - 64), start)
+    return (local.start(), end) if local else None
+
+
+# Per-match checks: return the (possibly adjusted) span, or None to drop the match
+SPAN_CHECKS: Dict[str, Callable[[str, int, int], Optional[Tuple[int, int]]]] = {
+    'EMAIL': _email_span,
+    'URL': lambda text, start, end: (start, end) if _left_bounded(text, start, '') else None,
+    'SSN': lambda text, start, end: (
+        (start, end) if _left_bounded(text, start, '-') and not SSN_INVALID_RE.match(text, start) else None),
+    'PHONENUMBER': lambda text, start, end: (start, end) if _left_bounded(text, start, '_-') else None,
+    'CREDITCARDNUMBER': lambda text, start, end: (
+        (start, end) if _left_bounded(text, start, '-') and luhn_valid(text[start:end]) else None),
+}
+
+
+def resolve_overlaps(entities: List[dict]) -> List[dict]:
+    """
+    Sort entities by offset and, where spans overlap, keep the longer one
+    (then the higher score).
+    """
+    kept = []
+    for entity in sorted(entities, key=lambda e: (e['start'], e['end'])):
+        if kept and entity['start'] < kept[-1]['end']:
+            rank = (entity['end'] - entity['start'], entity['score'])
+            if rank > (kept[-1]['end'] - kept[-1]['start'], kept[-1]['score']):
+                kept[-1] = entity
+            continue
+        kept.append(entity)
+    return kept
+
+
+def detect_rules(texts: Sequence[str], rules: Optional[Dict[str, re.Pattern]] = None) -> List[list]:
+    """
+    Find structured PII with compiled regexes, one scan per rule over the
+    whole column joined with '\\0' separators; match offsets are mapped back
+    to rows with a single searchsorted. Returns one entity list per text in
+    the model's {entity_group, score, word, start, end} shape.
+    """
+    rules = RULES if rules is None else rules
+    texts = [text if isinstance(text, str) else '' for text in texts]
+    joined = '\0'.join(texts)
+    row_starts = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]])
+
+    results = [[] for _ in texts]
+    found = 0
+    for group, pattern in rules.items():
+        check = SPAN_CHECKS.get(group)
+        spans = [m.span() for m in pattern.finditer(joined)]
+        if check is not None:
+            spans = [span for span in (check(joined, start, end) for start, end in spans) if span]
+        if not spans:
+            continue
+        rows = np.searchsorted(row_starts, [start for start, _ in spans], side='right') - 1
+        for (start, end), row in zip(spans, rows.tolist()):
+            offset = int(row_starts[row])
+            results[row].append({'entity_group': group, 'score': RULE_SCORE, 'word': joined[start:end],
+                                 'start': start - offset, 'end': end - offset})
+        found += len(spans)
+
+    results = [resolve_overlaps(entities) if len(entities) > 1 else entities for entities in results]
+    logging.info(f"Rule detectors found {found:,} structured PII matches in {len(texts):,} texts")
+    return results
+
+
+def merge_entities(model_entities: List[dict], rule_entities: List[dict]) -> List[dict]:
+    """
+    Combine model and rule output for one text, resolving overlaps with
+    resolve_overlaps (rule matches win ties through their score of 1.0).
+    """
+    if not rule_entities:
+        return model_entities
+    return resolve_overlaps(list(model_entities) + list(rule_entities))
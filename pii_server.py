@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import logging
+import threading
+import socketserver
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+from pii_client import DEFAULT_SOCKET, recv_message, send_message
+from pii_entities import PII_BACKENDS, PII_MODEL, detect_pii, load_pii_pipeline, model_key
+from pii_stub import load_stub_pipeline
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# After the first request arrives, wait this long for others to share its batch
+COALESCE_WINDOW = 0.005
+# Stop gathering once a shared batch holds this many texts
+MAX_COALESCED_TEXTS = 512
+# detect_pii settings a client may pass; requests are only coalesced when these match
+DETECT_KWARGS = ('batch_size', 'bucket', 'bucket_boundaries', 'max_tokens', 'stride', 'tokens')
+
+
+class BatchCoalescer:
+    """
+    Runs every detect request on one resident pipeline from a single model
+    thread. Requests that arrive within COALESCE_WINDOW of each other (with
+    the same detect settings) are concatenated into one detect_pii call, so
+    small requests from concurrent clients share length-bucketed batches.
+    """
+
+    def __init__(self, pipe, window: float = COALESCE_WINDOW, max_texts: int = MAX_COALESCED_TEXTS):
+        self.pipe = pipe
+        self.window = window
+        self.max_texts = max_texts
+        self.queue = queue.Queue()
+        threading.Thread(target=self._loop, name='pii-model', daemon=True).start()
+
+    def submit(self, texts: List[str], kwargs: dict) -> Future:
+        future = Future()
+        self.queue.put((json.dumps(kwargs, sort_keys=True), texts, kwargs, future))
+        return future
+
+    def _loop(self) -> None:
+        deferred = []
+        while True:
+            first = deferred.pop(0) if deferred else self.queue.get()
+            group = [first]
+            # Requests deferred for other settings may match this one
+            for item in [item for item in deferred if item[0] == first[0]]:
+                deferred.remove(item)
+                group.append(item)
+            count = sum(len(item[1]) for item in group)
+            deadline = time.monotonic() + self.window
+            while count < self.max_texts:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item[0] == first[0]:
+                    group.append(item)
+                    count += len(item[1])
+                else:
+                    deferred.append(item)
+            self._run(group)
+
+    def _run(self, group: List[Tuple[str, List[str], dict, Future]]) -> None:
+        texts = [text for _, request_texts, _, _ in group for text in request_texts]
+        stats = {}
+        try:
+            results = detect_pii(self.pipe, texts, stats=stats, **group[0][2])
+        except Exception as e:
+            logging.exception(f"Shared batch of {len(texts)} texts failed: {e}")
+            for _, _, _, future in group:
+                future.set_exception(e)
+            return
+        row_seconds = stats.pop('row_seconds', [0.0] * len(texts))
+        # Batch counters describe the whole shared batch
+        stats.update(coalesced_requests=len(group), coalesced_texts=len(texts))
+        offset = 0
+        for _, request_texts, _, future in group:
+            end = offset + len(request_texts)
+            future.set_result((results[offset:end], dict(stats, row_seconds=row_seconds[offset:end])))
+            offset = end
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    Serves one client connection: any number of ping/detect requests until it closes.
+    """
+
+    def handle(self) -> None:
+        while True:
+            try:
+                message = recv_message(self.connection)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Dropping PII client connection: {e}")
+                return
+            if message is None:
+                return
+            op = message.get('op')
+            try:
+                if op == 'ping':
+                    reply = {'model': self.server.model}
+                elif op == 'detect':
+                    kwargs = message.get('kwargs', {})
+                    unknown = set(kwargs) - set(DETECT_KWARGS)
+                    if unknown:
+                        reply = {'error': f"unsupported detect settings: {sorted(unknown)}"}
+                    else:
+                        results, stats = self.server.coalescer.submit(message['texts'], kwargs).result()
+                        reply = {'results': results, 'stats': stats}
+                else:
+                    reply = {'error': f"unknown op {op!r}"}
+            except Exception as e:
+                reply = {'error': str(e)}
+            send_message(self.connection, reply)
+
+
+class PIIServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix-socket server holding one loaded pipeline; one thread per client.
+    """
+    daemon_threads = True
+    # Many scripts may connect at once
+    request_queue_size = 128
+
+    def __init__(self, address: str, pipe, model: str):
+        self.model = model
+        self.coalescer = BatchCoalescer(pipe)
+        super().__init__(address, _Handler)
+
+
+def _clear_stale_socket(address: str) -> None:
+    """
+    Remove a socket file left by a dead server; exit if a live one answers.
+    """
+    if not os.path.exists(address):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(address)
+    except OSError:
+        os.unlink(address)
+        return
+    finally:
+        probe.close()
+    logging.error(f"A PII server is already listening on {address}")
+    sys.exit(1)
+
+
+def serve(address: str = DEFAULT_SOCKET, loader: Callable = load_pii_pipeline,
+          model: Optional[str] = None) -> None:
+    """
+    Load the pipeline once via `loader` and serve detect requests on the
+    Unix socket `address` until interrupted. `model` is reported to clients
+    and keys their result caches (defaults to model_key(loader=loader)).
+    """
+    model = model or model_key(loader=loader)
+    if model is None:
+        logging.error(f"Cannot resolve the commit of {PII_MODEL}; pin PII_MODEL_REVISION to serve it")
+        sys.exit(1)
+    Path(address).parent.mkdir(parents=True, exist_ok=True)
+    _clear_stale_socket(address)
+    pipe = loader()
+    with PIIServer(address, pipe, model) as server:
+        logging.info(f"PII server for {model} listening on {address}")
+        print(f"PII server for {model} listening on {address}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(address)
+            logging.info(f"PII server on {address} stopped")
+
+
+def main():
+    # pii_server.py [socket] [--stub | --backend=onnx-int8]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    address = args[0] if args else DEFAULT_SOCKET
+    backend = next((arg.split('=', 1)[1] for arg in sys.argv[1:] if arg.startswith('--backend=')), 'eager')
+    if '--stub' in sys.argv:
+        serve(address, load_stub_pipeline)
+    elif backend not in PII_BACKENDS:
+        logging.error(f"Unknown backend {backend!r}; expected one of {sorted(PII_BACKENDS)}")
+        sys.exit(1)
+    elif backend == 'eager':
+        serve(address)
+    else:
+        serve(address, PII_BACKENDS[backend], model=model_key(backend))
+
+
+if __name__ == '__main__':
+    main()
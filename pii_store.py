@@ -0,0 +1,165 @@
+import re
+import ast
+import sys
+import logging
+from pathlib import Path
+from typing import Optional, Sequence
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pii_tokens import text_digest
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# One detected entity, as produced by identify_pii
+ENTITY_STRUCT = pa.struct([
+    ('entity_group', pa.string()),
+    ('score', pa.float32()),
+    ('start', pa.int32()),
+    ('end', pa.int32()),
+    ('word', pa.string()),
+])
+ENTITY_LIST = pa.list_(ENTITY_STRUCT)
+ENTITY_FIELDS = [field.name for field in ENTITY_STRUCT]
+# Digest (pii_tokens.text_digest) of the text an entity's offsets point into
+DIGEST_COLUMN = 'text_digest'
+# Flat entity table: one row per entity, keyed by the row_id of its text
+ENTITY_TABLE_SCHEMA = pa.schema([pa.field('row_id', pa.int64()), *ENTITY_STRUCT,
+                                 pa.field(DIGEST_COLUMN, pa.binary())])
+
+# Entities per row group of the flat entity table; groups are sorted by row_id so row filters skip most of them
+ENTITY_ROW_GROUP_SIZE = 100_000
+
+# numpy scalar reprs in legacy CSVs, e.g. np.float32(0.97)
+NUMPY_SCALAR_RE = re.compile(r'np\.\w+\(([^()]*)\)')
+
+
+def entities_to_arrow(entities: Sequence) -> pa.Array:
+    """
+    Convert per-row entity lists to a typed list<struct> array; missing rows become [].
+    """
+    return pa.array([e if isinstance(e, list) else [] for e in entities], type=ENTITY_LIST)
+
+
+def row_ids(df: pd.DataFrame) -> np.ndarray:
+    """
+    Stable row ids for `df`: its index if integer, else row positions.
+    """
+    if pd.api.types.is_integer_dtype(df.index):
+        return df.index.to_numpy(dtype=np.int64)
+    return np.arange(len(df), dtype=np.int64)
+
+
+def write_pii_parquet(df: pd.DataFrame, path, entity_column: str = 'pii_entities') -> None:
+    """
+    Save `df` to Parquet with `entity_column` as a typed nested column and
+    a 'row_id' column matching the flat entity table.
+    """
+    table = pa.Table.from_pandas(df.drop(columns=[entity_column]), preserve_index=False)
+    table = table.add_column(0, 'row_id', pa.array(row_ids(df)))
+    table = table.append_column(entity_column, entities_to_arrow(df[entity_column]))
+    pq.write_table(table, path, compression='zstd')
+    logging.info(f"Saved {len(df):,} rows with typed '{entity_column}' to {path}")
+
+
+def read_pii_parquet(path, columns: Optional[Sequence[str]] = None,
+                     entity_column: str = 'pii_entities') -> pd.DataFrame:
+    """
+    Load a file written by write_pii_parquet; entities come back as lists of dicts.
+    """
+    table = pq.read_table(path, columns=list(columns) if columns else None, memory_map=True)
+    df = table.drop_columns([entity_column]).to_pandas() if entity_column in table.column_names else table.to_pandas()
+    if entity_column in table.column_names:
+        df[entity_column] = table.column(entity_column).to_pylist()
+    return df
+
+
+def entity_table(df: pd.DataFrame, entity_column: str = 'pii_entities',
+                 text_column: Optional[str] = None) -> pa.Table:
+    """
+    Flatten the entity lists into one row per entity, keyed by 'row_id'.
+    With `text_column` (the column the entities were detected in), each
+    entity also carries the digest of its row's text, so readers can check
+    that their text is the one the offsets point into.
+    """
+    entities = entities_to_arrow(df[entity_column])
+    flat = pc.list_flatten(entities)
+    parents = pc.list_parent_indices(entities).to_numpy()
+    columns = [pa.array(row_ids(df)[parents])] + [flat.field(name) for name in ENTITY_FIELDS]
+    schema = ENTITY_TABLE_SCHEMA
+    if text_column is not None:
+        texts = df[text_column].to_numpy()
+        columns.append(pa.array([text_digest(texts[i]) for i in parents.tolist()], type=pa.binary()))
+    else:
+        schema = schema.remove(schema.get_field_index(DIGEST_COLUMN))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def write_entity_table(df: pd.DataFrame, path, entity_column: str = 'pii_entities',
+                       text_column: Optional[str] = None) -> None:
+    """
+    Save the flat entity table (see entity_table) to Parquet, every entity
+    kept whatever its score, sorted by row_id and start in row groups of
+    ENTITY_ROW_GROUP_SIZE. The row-group statistics then index the table by
+    row_id for read_entity_table(rows=...).
+    """
+    table = entity_table(df, entity_column, text_column).sort_by([('row_id', 'ascending'), ('start', 'ascending')])
+    pq.write_table(table, path, compression='zstd', row_group_size=ENTITY_ROW_GROUP_SIZE)
+    logging.info(f"Saved {table.num_rows:,} entities for {len(df):,} rows to {path}")
+
+
+def read_entity_table(path, entity_groups: Optional[Sequence[str]] = None,
+                      min_score: Optional[float] = None, rows: Optional[Sequence[int]] = None,
+                      columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Load entities, pushing entity-group, score and row_id filters down into
+    the Parquet scan; with `rows`, row groups outside their row_id range are
+    skipped unread. `columns` limits the columns loaded.
+    """
+    filters = []
+    if entity_groups:
+        filters.append(('entity_group', 'in', list(entity_groups)))
+    if min_score is not None:
+        # At the stored float32 precision, so e.g. min_score=0.9 keeps scores of float32(0.9)
+        filters.append(('score', '>=', np.float32(min_score)))
+    if rows is not None:
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        if len(rows):
+            filters.extend([('row_id', '>=', int(rows[0])), ('row_id', '<=', int(rows[-1]))])
+        filters.append(('row_id', 'in', rows.tolist()))
+    return pq.read_table(path, columns=list(columns) if columns else None, filters=filters or None,
+                         memory_map=True).to_pandas()
+
+
+def convert_legacy_csv(csv_path, out_path=None, entity_column: str = 'pii_entities') -> Path:
+    """
+    Convert a CSV holding Python-repr entity lists (e.g. emails_with_pii.csv)
+    to a typed Parquet file plus a flat entity table next to it.
+    """
+    out_path = Path(out_path) if out_path else Path(csv_path).with_suffix('.parquet')
+    df = pd.read_csv(csv_path, encoding='utf-8')
+    df[entity_column] = [
+        ast.literal_eval(NUMPY_SCALAR_RE.sub(r'\1', value)) if isinstance(value, str) else []
+        for value in df[entity_column]
+    ]
+    write_pii_parquet(df, out_path, entity_column)
+    write_entity_table(df, out_path.with_name(f"{out_path.stem}_entities.parquet"), entity_column)
+    return out_path
+
+
+def main():
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "emails_with_pii.csv"
+    out_path = convert_legacy_csv(csv_path)
+    print(f"Done. Output saved to {out_path}")
+
+
+if __name__ == '__main__':
+    main()
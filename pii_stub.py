@@ -0,0 +1,39 @@
+import re
+from typing import List, Sequence, Union
+import numpy as np
+from pii_rules import detect_rules
+from synthetic_corpus import FIRST_NAMES, LAST_NAMES
+
+# Score the stub gives name matches (rule matches keep pii_rules.RULE_SCORE)
+NAME_SCORE = 0.9
+NAME_RE = re.compile(r'\b(?:(' + '|'.join(FIRST_NAMES) + r')|(' + '|'.join(LAST_NAMES) + r'))\b')
+
+
+class StubPIIPipeline:
+    """
+    Deterministic, offline stand-in for the Hugging Face token-classification
+    pipeline returned by load_pii_pipeline, for benchmarks and CI where the
+    gated model cannot be downloaded. Called like the real pipeline (one text
+    or a list plus batch_size) and returns the same entity dicts: regex
+    matches from pii_rules plus FIRSTNAME/LASTNAME for the synthetic corpus
+    name lists. It has no tokenizer, so texts are never windowed.
+    """
+    tokenizer = None
+
+    def __call__(self, inputs: Union[str, Sequence[str]], batch_size: int = 1) -> Union[list, List[list]]:
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        results = detect_rules(texts)
+        for text, entities in zip(texts, results):
+            for m in NAME_RE.finditer(text):
+                entities.append({'entity_group': 'FIRSTNAME' if m.group(1) else 'LASTNAME',
+                                 'score': np.float32(NAME_SCORE), 'word': m.group(),
+                                 'start': m.start(), 'end': m.end()})
+            entities.sort(key=lambda e: e['start'])
+        return results[0] if isinstance(inputs, str) else results
+
+
+def load_stub_pipeline() -> StubPIIPipeline:
+    """
+    Drop-in for load_pii_pipeline, e.g. identify_pii(df, loader=load_stub_pipeline).
+    """
+    return StubPIIPipeline()
@@ -0,0 +1,251 @@
+import sys
+import json
+import hashlib
+import logging
+import shutil
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from parsed_cache import CACHE_DIR
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# Bump whenever the array layout changes
+TOKEN_STORE_VERSION = 1
+# One store directory per source and tokenizer: .cache/tokens/<source>.<tokenizer fingerprint>/
+TOKENS_DIR = Path(CACHE_DIR) / "tokens"
+# Texts per tokenizer call while building a store
+TOKENIZE_CHUNK = 1000
+# Short text used to find the special tokens a tokenizer wraps around a sequence
+SPECIAL_PROBE = 'a'
+# Serialized tokenizer state set per call rather than by the tokenizer itself
+FINGERPRINT_SKIP = ('padding', 'truncation')
+# Default input for `python pii_tokens.py`
+TOKENS_INPUT = "emails_with_pii_cleaned.csv"
+
+
+class TokenArrays(NamedTuple):
+    """
+    Tokenization of one text without special tokens: token ids, (start, end)
+    character offsets into the text, and whether each token starts a word.
+    """
+    input_ids: np.ndarray
+    offsets: np.ndarray
+    word_starts: np.ndarray
+
+
+def text_digest(text: str) -> bytes:
+    """
+    Content address of a text; texts are hashed exactly as passed so stored offsets stay exact.
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    """
+    Identity of a fast tokenizer: hash of its serialized state (vocabulary,
+    normalizer, pre-tokenizer, post-processor, added tokens), leaving out
+    the padding and truncation settings that each call may change.
+    """
+    if not getattr(tokenizer, 'is_fast', False):
+        raise ValueError("Pre-tokenization needs a fast tokenizer (offset mappings)")
+    state = json.loads(tokenizer.backend_tokenizer.to_str())
+    for key in FINGERPRINT_SKIP:
+        state.pop(key, None)
+    return hashlib.blake2b(json.dumps(state, sort_keys=True).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def token_store_path(source, tokenizer) -> Path:
+    """
+    Store directory for the texts of `source` (a file name) under `tokenizer`.
+    """
+    return TOKENS_DIR / f"{Path(source).name}.{tokenizer_fingerprint(tokenizer)}"
+
+
+def word_starts(word_ids: Sequence[Optional[int]]) -> np.ndarray:
+    """
+    True for each token whose word differs from the previous token's.
+    """
+    ids = np.array([-1 if w is None else w for w in word_ids], dtype=np.int64)
+    starts = np.ones(len(ids), dtype=bool)
+    starts[1:] = ids[1:] != ids[:-1]
+    return starts
+
+
+def build_token_store(texts: Iterable[str], tokenizer, path, source: str = '') -> Path:
+    """
+    Tokenize each distinct non-empty text once, without special tokens or
+    truncation, and save the result under `path` as flat .npy arrays that
+    are memory-mapped on load: token ids, offsets and word starts for all
+    texts back to back, 'row_ptr' (text i owns tokens row_ptr[i]:row_ptr[i + 1])
+    and the sorted text digests that rows are looked up by. Attention masks
+    are not stored: they are ones over each text's tokens and are rebuilt
+    with the padding. Returns `path`.
+    """
+    path = Path(path)
+    fingerprint = tokenizer_fingerprint(tokenizer)
+    unique = {text_digest(text): text for text in texts if isinstance(text, str) and text.strip()}
+    digests = sorted(unique)
+    # Ids fit in 16 bits for vocabularies up to 65,536 tokens
+    id_dtype = np.uint16 if len(tokenizer) <= 1 << 16 else np.int32
+
+    input_ids, offsets, starts = [], [], []
+    row_ptr = np.zeros(len(digests) + 1, dtype=np.int64)
+    for i in range(0, len(digests), TOKENIZE_CHUNK):
+        chunk = [unique[digest] for digest in digests[i:i + TOKENIZE_CHUNK]]
+        encoded = tokenizer(chunk, add_special_tokens=False, return_offsets_mapping=True, truncation=False,
+                            return_attention_mask=False, return_token_type_ids=False)
+        for j, ids in enumerate(encoded['input_ids']):
+            input_ids.append(np.array(ids, dtype=id_dtype))
+            offsets.append(np.array(encoded['offset_mapping'][j], dtype=np.int32).reshape(-1, 2))
+            starts.append(word_starts(encoded.word_ids(j)))
+            row_ptr[i + j + 1] = row_ptr[i + j] + len(ids)
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    np.save(tmp_path / 'digests.npy', np.array(digests, dtype='S16'))
+    np.save(tmp_path / 'row_ptr.npy', row_ptr)
+    np.save(tmp_path / 'input_ids.npy', np.concatenate(input_ids) if input_ids else np.zeros(0, id_dtype))
+    np.save(tmp_path / 'offsets.npy', np.concatenate(offsets) if offsets else np.zeros((0, 2), np.int32))
+    np.save(tmp_path / 'word_starts.npy', np.concatenate(starts) if starts else np.zeros(0, bool))
+    meta = {'version': TOKEN_STORE_VERSION, 'tokenizer': fingerprint,
+            'tokenizer_name': getattr(tokenizer, 'name_or_path', ''), 'source': str(source),
+            'texts': len(digests), 'tokens': int(row_ptr[-1])}
+    (tmp_path / 'meta.json').write_text(json.dumps(meta, indent=2))
+    shutil.rmtree(path, ignore_errors=True)
+    tmp_path.replace(path)
+    logging.info(f"Built token store {path}: {len(digests):,} texts, {int(row_ptr[-1]):,} tokens")
+    return path
+
+
+class TokenStore:
+    """
+    Read side of build_token_store: the stored tokenization of a text,
+    looked up by its content digest, for the tokenizer it was built with.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / 'meta.json').read_text())
+        if self.meta.get('version') != TOKEN_STORE_VERSION:
+            raise ValueError(f"Token store {self.path} has version {self.meta.get('version')}, "
+                             f"expected {TOKEN_STORE_VERSION}")
+        self.fingerprint = self.meta['tokenizer']
+        self.digests = np.load(self.path / 'digests.npy', mmap_mode='r')
+        self.row_ptr = np.load(self.path / 'row_ptr.npy', mmap_mode='r')
+        self.input_ids = np.load(self.path / 'input_ids.npy', mmap_mode='r')
+        self.offsets = np.load(self.path / 'offsets.npy', mmap_mode='r')
+        self.word_starts = np.load(self.path / 'word_starts.npy', mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    def matches(self, tokenizer) -> bool:
+        """
+        Whether the store was built with this tokenizer (False if it is not a fast tokenizer).
+        """
+        try:
+            return tokenizer_fingerprint(tokenizer) == self.fingerprint
+        except ValueError:
+            return False
+
+    def find(self, text: str) -> int:
+        """
+        Row of `text` in the store, or -1 if it is absent.
+        """
+        # numpy 'S' values drop trailing NUL bytes; digests are fixed-length, so that is lossless
+        digest = text_digest(text).rstrip(b'\0')
+        row = int(np.searchsorted(self.digests, digest))
+        return row if row < len(self.digests) and self.digests[row] == digest else -1
+
+    def get(self, text: str) -> Optional[TokenArrays]:
+        """
+        Stored tokenization of `text`, or None if it is absent.
+        """
+        row = self.find(text)
+        if row == -1:
+            return None
+        start, end = int(self.row_ptr[row]), int(self.row_ptr[row + 1])
+        return TokenArrays(np.asarray(self.input_ids[start:end]), np.asarray(self.offsets[start:end]),
+                           np.asarray(self.word_starts[start:end]))
+
+
+@lru_cache(maxsize=None)
+def open_token_store(path: str) -> TokenStore:
+    """
+    TokenStore for `path`, opened once per process.
+    """
+    return TokenStore(path)
+
+
+def slice_tokens(arrays: TokenArrays, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Token ids covering characters start:end of the stored text, with their
+    offsets made relative to `start` (i.e. to text[start:end]).
+    """
+    first = int(np.searchsorted(arrays.offsets[:, 0], start, side='left'))
+    last = int(np.searchsorted(arrays.offsets[:, 1], end, side='right'))
+    return arrays.input_ids[first:last], arrays.offsets[first:last] - start
+
+
+def special_affixes(tokenizer) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Special token ids the tokenizer puts before and after a single
+    sequence (e.g. [CLS] and [SEP]), read off the encoding of a probe text.
+    """
+    plain = tokenizer(SPECIAL_PROBE, add_special_tokens=False)['input_ids']
+    full = tokenizer(SPECIAL_PROBE)['input_ids']
+    for i in range(len(full) - len(plain) + 1):
+        if full[i:i + len(plain)] == plain:
+            return np.array(full[:i], dtype=np.int64), np.array(full[i + len(plain):], dtype=np.int64)
+    raise ValueError(f"Cannot locate the sequence within the special tokens of {type(tokenizer).__name__}")
+
+
+def pretokenize_csv(csv_path, text_column: str = 'Body', tokenizer=None) -> Path:
+    """
+    Tokenize the `text_column` of a CSV once with the PII model's fast
+    tokenizer (or `tokenizer`) into its token store. Pass the returned
+    path to identify_pii(tokens=...) on later runs.
+    """
+    if tokenizer is None:
+        try:
+            from transformers import AutoTokenizer
+        except ImportError:
+            logging.error("transformers library not found. Install with 'pip install transformers'.")
+            sys.exit(1)
+        from pii_entities import PII_MODEL, pii_model_revision
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(PII_MODEL, revision=pii_model_revision())
+        except Exception as e:
+            logging.exception(f"Failed to load tokenizer for {PII_MODEL}: {e}")
+            sys.exit(1)
+    try:
+        texts = pd.read_csv(csv_path, usecols=[text_column], encoding='utf-8')[text_column]
+    except FileNotFoundError:
+        logging.error(f"CSV file not found: {csv_path}")
+        sys.exit(1)
+    except ValueError as e:
+        logging.error(f"Cannot read column {text_column!r} from {csv_path}: {e}")
+        sys.exit(1)
+    return build_token_store(texts, tokenizer, token_store_path(csv_path, tokenizer), source=str(csv_path))
+
+
+def main():
+    # pii_tokens.py [csv] [text column]
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else TOKENS_INPUT
+    text_column = sys.argv[2] if len(sys.argv) > 2 else 'Body'
+    path = pretokenize_csv(csv_path, text_column)
+    print(f"Done. Token store at {path}")
+
+
+if __name__ == '__main__':
+    main()
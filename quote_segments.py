@@ -0,0 +1,74 @@
+import re
+import logging
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# Lines that open a quoted or forwarded block in Enron bodies
+QUOTE_START_RE = re.compile(
+    r'^[ \t]*(?:'
+    r'-{3,}[ \t]*Original Message'                           # Outlook reply
+    r'|-{3,}[ \t]*Forwarded by'                              # Notes forward banner
+    r'|From:[^\n]*(?:\n[ \t]*(?:Sent|Date):'                 # Outlook header block
+    r'|\d{1,2}/\d{1,2}/\d{2,4} \d{1,2}:\d{2} ?[AP]M)'        # Notes inline 'From: name date'
+    # Notes 'name' + 'date' lines; the lookahead keeps a failed date match linear in the line length
+    r'|(?=[^\n]*\S)[^\n]*\n[ \t]*\d{1,2}/\d{1,2}/\d{2,4} \d{1,2}:\d{2} ?[AP]M'
+    r'|[^\n]*\bwrote:[ \t]*$'                                # 'On ... X wrote:'
+    r')',
+    re.M | re.I,
+)
+# Runs of '>'-quoted lines
+GT_QUOTE_RE = re.compile(r'^(?:[ \t]*>[^\n]*(?:\n|$))+', re.M)
+
+
+def split_segments(body: str) -> List[Tuple[int, int]]:
+    """
+    Split a body into (start, end) spans: the authored text followed by each
+    quoted or forwarded block. Spans are trimmed of surrounding whitespace,
+    so identical quoted blocks in different bodies have identical text.
+    """
+    cuts = {0, len(body)}
+    cuts.update(m.start() for m in QUOTE_START_RE.finditer(body))
+    for m in GT_QUOTE_RE.finditer(body):
+        cuts.update((m.start(), m.end()))
+    bounds = sorted(cuts)
+
+    spans = []
+    for start, end in zip(bounds, bounds[1:]):
+        segment = body[start:end]
+        stripped = segment.strip()
+        if stripped:
+            lead = len(segment) - len(segment.lstrip())
+            spans.append((start + lead, start + lead + len(stripped)))
+    return spans
+
+
+def detect_segmented(texts: Sequence[str], detect: Callable[[List[str]], List[list]],
+                     stats: Optional[dict] = None) -> List[list]:
+    """
+    Run `detect` on the segments of every text rather than whole texts, so a
+    quoted block shared across a thread can be detected once (`detect` is
+    expected to de-duplicate, e.g. pii_cache.cached_detect). Entities are
+    mapped back to offsets in each text that contains the segment.
+    """
+    segments = []
+    owners = []
+    for i, text in enumerate(texts):
+        if not (isinstance(text, str) and text.strip()):
+            continue
+        for start, end in split_segments(text):
+            segments.append(text[start:end])
+            owners.append((i, start))
+
+    results = [[] for _ in texts]
+    for (i, start), entities in zip(owners, detect(segments) if segments else []):
+        results[i].extend(dict(entity, start=entity['start'] + start, end=entity['end'] + start)
+                          for entity in entities)
+
+    unique = set(segments)
+    total_chars = sum(len(s) for s in segments)
+    unique_chars = sum(len(s) for s in unique)
+    logging.info(f"Split {len(texts):,} texts into {len(segments):,} segments ({len(unique):,} unique); "
+                 f"{unique_chars / total_chars if total_chars else 0:.1%} of characters are novel")
+    if stats is not None:
+        stats.update(segments=len(segments), unique_segments=len(unique),
+                     segment_chars=total_chars, unique_segment_chars=unique_chars)
+    return results
@@ -0,0 +1,230 @@
+import os
+import sys
+import mmap
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# Bump whenever the walk or the array layout changes
+RECORD_INDEX_VERSION = 1
+# Written next to the CSV: emails.csv -> emails.csv.index.npz
+INDEX_SUFFIX = '.index.npz'
+
+# (row start, file, message start, header end, message end); offsets are bytes into the CSV
+RecordOffsets = Tuple[int, str, int, int, int]
+
+
+def _closing_quote(mm: mmap.mmap, pos: int) -> int:
+    """
+    Offset of the quote closing a CSV field that opened before `pos`,
+    skipping doubled ("") escaped quotes.
+    """
+    while True:
+        q = mm.find(b'"', pos)
+        if q == -1:
+            return len(mm)
+        if mm[q + 1:q + 2] != b'"':
+            return q
+        pos = q + 2
+
+
+def iter_record_offsets(mm: mmap.mmap) -> Iterator[RecordOffsets]:
+    """
+    Walk a 'file,message' CSV held in `mm` record by record, yielding where
+    each row, its message field and the message's header block (up to the
+    first blank line) lie. Bodies are skipped with C-level byte searches;
+    only the 'file' field is decoded. Message offsets exclude the enclosing
+    quotes, so mm[msg_start:msg_end] still has "" escapes.
+    """
+    pos = mm.find(b'\n') + 1
+    size = len(mm)
+    while 0 < pos < size:
+        row_start = pos
+        if mm[pos:pos + 1] == b'"':
+            end = _closing_quote(mm, pos + 1)
+            file = mm[pos + 1:end].replace(b'""', b'"').decode('utf-8')
+            comma = end + 1
+        else:
+            comma = mm.find(b',', pos)
+            file = mm[pos:comma].decode('utf-8')
+        start = comma + 1
+        if mm[start:start + 1] == b'"':
+            msg_start = start + 1
+            msg_end = _closing_quote(mm, msg_start)
+            pos = mm.find(b'\n', msg_end) + 1
+        else:
+            msg_start = start
+            line_end = mm.find(b'\n', start)
+            msg_end = line_end if line_end != -1 else size
+            pos = line_end + 1 if line_end != -1 else size
+        header_end = mm.find(b'\n\n', msg_start, msg_end)
+        yield row_start, file, msg_start, header_end if header_end != -1 else msg_end, msg_end
+
+
+def index_path(csv_path) -> Path:
+    """
+    Where the record index of `csv_path` lives (next to the CSV).
+    """
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + INDEX_SUFFIX)
+
+
+def _source_stamp(csv_path: Path) -> np.ndarray:
+    """
+    Version, size and mtime of the CSV; the index is rebuilt when any differs.
+    """
+    stat = os.stat(csv_path)
+    return np.array([RECORD_INDEX_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def index_is_current(csv_path) -> bool:
+    """
+    Whether an index exists for `csv_path` and was built from its current contents.
+    """
+    path = index_path(csv_path)
+    if not path.is_file():
+        return False
+    with np.load(path) as arrays:
+        return np.array_equal(arrays['stamp'], _source_stamp(csv_path))
+
+
+def build_record_index(csv_path, force: bool = False) -> Path:
+    """
+    One pass over the CSV recording, per record, the byte offsets of the
+    row, the message field and the header/body boundary plus the 'file'
+    path, saved as numpy arrays in an .npz next to the CSV. Reuses an
+    up-to-date index unless `force`; returns its path.
+    """
+    csv_path = Path(csv_path)
+    if not csv_path.is_file():
+        logging.error(f"CSV file not found: {csv_path}")
+        sys.exit(1)
+    path = index_path(csv_path)
+    if not force and index_is_current(csv_path):
+        return path
+    stamp = _source_stamp(csv_path)
+
+    row_start, files, msg_start, header_end, msg_end = [], [], [], [], []
+    with open(csv_path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for offsets in iter_record_offsets(mm):
+            row_start.append(offsets[0])
+            files.append(offsets[1].encode('utf-8'))
+            msg_start.append(offsets[2])
+            header_end.append(offsets[3])
+            msg_end.append(offsets[4])
+    # Sentinel: the end of the last row, so row i spans row_start[i]:row_start[i + 1]
+    row_start.append(int(stamp[1]))
+    files = np.array(files, dtype=bytes) if files else np.array([], dtype='S1')
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as fh:
+        np.savez(fh, stamp=stamp, row_start=np.array(row_start, dtype=np.int64), files=files,
+                 file_order=np.argsort(files, kind='stable'),
+                 msg_start=np.array(msg_start, dtype=np.int64),
+                 header_end=np.array(header_end, dtype=np.int64),
+                 msg_end=np.array(msg_end, dtype=np.int64))
+    tmp_path.replace(path)
+    logging.info(f"Built record index {path}: {len(msg_start):,} records")
+    return path
+
+
+class RecordIndex:
+    """
+    Random access to the records of a 'file,message' CSV through its byte
+    offset index (see build_record_index): look records up by position or
+    'file' path, slice out header blocks or whole messages without reading
+    anything else, and cut the file into byte-balanced row ranges for
+    parallel workers.
+    """
+
+    def __init__(self, csv_path, build: bool = True):
+        self.csv_path = Path(csv_path)
+        path = build_record_index(self.csv_path) if build else index_path(self.csv_path)
+        with np.load(path) as arrays:
+            self.row_start = arrays['row_start']
+            self.files = arrays['files']
+            self.file_order = arrays['file_order']
+            self.msg_start = arrays['msg_start']
+            self.header_end = arrays['header_end']
+            self.msg_end = arrays['msg_end']
+        self._fh = open(self.csv_path, 'rb')
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.msg_start)
+
+    def __enter__(self) -> 'RecordIndex':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mm.close()
+        self._fh.close()
+
+    def position(self, file: str) -> int:
+        """
+        Row position of the record with this 'file' path, or -1 if absent.
+        """
+        key = file.encode('utf-8')
+        i = np.searchsorted(self.files, key, sorter=self.file_order)
+        if i < len(self) and self.files[self.file_order[i]] == key:
+            return int(self.file_order[i])
+        return -1
+
+    def file(self, row: int) -> str:
+        return self.files[row].decode('utf-8')
+
+    def message(self, row: int) -> str:
+        """
+        The 'message' field of one record, CSV quote escapes removed.
+        """
+        data = self._mm[self.msg_start[row]:self.msg_end[row]]
+        return (data.replace(b'""', b'"') if b'""' in data else data).decode('utf-8')
+
+    def header_bytes(self, row: int) -> bytes:
+        """
+        The header block of one record as undecoded bytes, CSV quote escapes removed.
+        """
+        data = self._mm[self.msg_start[row]:self.header_end[row]]
+        return data.replace(b'""', b'"') if b'""' in data else data
+
+    def records(self, rows: Optional[Sequence[int]] = None) -> Iterator[Tuple[str, str]]:
+        """
+        (file, message) for the given row positions (all rows by default), in that order.
+        """
+        for row in (range(len(self)) if rows is None else rows):
+            yield self.file(row), self.message(row)
+
+    def shards(self, n: int) -> List[Tuple[int, int, int, int]]:
+        """
+        Split the records into at most `n` contiguous shards of roughly equal
+        bytes, as (first row, end row, start byte, end byte). Byte ranges are
+        whole rows, back to back, so a worker can read its range directly.
+        """
+        targets = np.linspace(self.row_start[0], self.row_start[-1], n + 1)
+        cuts = np.searchsorted(self.row_start, targets)
+        cuts[0], cuts[-1] = 0, len(self)
+        cuts = np.unique(cuts.clip(0, len(self)))
+        return [(int(a), int(b), int(self.row_start[a]), int(self.row_start[b]))
+                for a, b in zip(cuts[:-1], cuts[1:])]
+
+
+def main():
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "emails.csv"
+    path = build_record_index(csv_path, force='--force' in sys.argv[2:])
+    print(f"Done. Record index at {path}")
+
+
+if __name__ == '__main__':
+    main()
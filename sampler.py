@@ -0,0 +1,148 @@
+import re
+import sys
+import math
+import mmap
+import random
+import itertools
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+import pandas as pd
+from header_scan import HeaderSpan, iter_spans
+from record_index import RecordIndex, index_is_current
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+DEFAULT_SEED = 42
+X_FOLDER_RE = re.compile(rb'^X-Folder:[ \t]*([^\n]*)', re.M | re.I)
+
+T = TypeVar('T')
+_END = object()
+
+
+def owner_key(span: HeaderSpan, headers: bytes) -> str:
+    """
+    Mailbox owner: the first component of the 'file' path (e.g. 'allen-p').
+    """
+    return span[1].split('/', 1)[0]
+
+
+def folder_key(span: HeaderSpan, headers: bytes) -> str:
+    """
+    Last component of the X-Folder header, lowercased (e.g. 'inbox', 'sent_items').
+    """
+    m = X_FOLDER_RE.search(headers)
+    folder = m.group(1).decode('utf-8', 'replace').strip() if m else ''
+    return folder.replace('/', '\\').rstrip('\\').rsplit('\\', 1)[-1].lower()
+
+
+STRATA: Dict[str, Callable[[HeaderSpan, bytes], str]] = {
+    'owner': owner_key,
+    'folder': folder_key,
+}
+
+
+def reservoir_sample(items: Iterable[T], k: int, rng: random.Random) -> List[T]:
+    """
+    Uniform sample of `k` items from a stream of unknown length in one pass
+    and O(k) memory (Li's Algorithm L: random skips between replacements,
+    so the RNG is called O(k log(n/k)) times rather than once per item).
+    Returns fewer than `k` items if the stream is shorter.
+    """
+    it = iter(items)
+    reservoir = [item for _, item in zip(range(k), it)]
+    if len(reservoir) < k or k == 0:
+        return reservoir
+    w = math.exp(math.log(rng.random()) / k)
+    while True:
+        skip = math.floor(math.log(rng.random()) / math.log(1 - w))
+        item = next(itertools.islice(it, skip, None), _END)
+        if item is _END:
+            return reservoir
+        reservoir[rng.randrange(k)] = item
+        w *= math.exp(math.log(rng.random()) / k)
+
+
+def proportional_allocation(counts: Dict[str, int], k: int) -> Dict[str, int]:
+    """
+    Split `k` draws across strata in proportion to their sizes (largest
+    remainder rounding, ties broken by stratum name).
+    """
+    total = sum(counts.values())
+    if total <= k:
+        return dict(counts)
+    quotas = {key: k * n / total for key, n in counts.items()}
+    alloc = {key: int(q) for key, q in quotas.items()}
+    by_remainder = sorted(quotas, key=lambda key: (alloc[key] - quotas[key], key))
+    for key in by_remainder[:k - sum(alloc.values())]:
+        alloc[key] += 1
+    return alloc
+
+
+def sample_spans(csv_path, mm: mmap.mmap, k: int, seed: int = DEFAULT_SEED,
+                 stratify_by: Optional[str] = None) -> List[HeaderSpan]:
+    """
+    Header spans (see header_scan) of a seeded sample of `k` records, in
+    file order. Without strata this is one reservoir pass; with an up-to-date
+    record index it is `k` draws of positions and no pass at all (the two
+    routes pick different, equally reproducible samples for a seed). With
+    `stratify_by` ('owner' or 'folder') every stratum keeps its own reservoir
+    during the pass and the final draws are allocated in proportion to
+    stratum sizes.
+    """
+    rng = random.Random(seed)
+    if stratify_by is None:
+        if index_is_current(csv_path):
+            with RecordIndex(csv_path, build=False) as index:
+                rows = sorted(rng.sample(range(len(index)), min(k, len(index))))
+                return [(row, index.file(row), int(index.msg_start[row]), int(index.header_end[row]),
+                         int(index.msg_end[row])) for row in rows]
+        return sorted(reservoir_sample(iter_spans(csv_path, mm), k, rng))
+
+    key_of = STRATA[stratify_by]
+    reservoirs: Dict[str, List[HeaderSpan]] = {}
+    counts: Dict[str, int] = {}
+    for span in iter_spans(csv_path, mm):
+        key = key_of(span, mm[span[2]:span[3]])
+        seen = counts.get(key, 0)
+        counts[key] = seen + 1
+        reservoir = reservoirs.setdefault(key, [])
+        # Algorithm R per stratum; no stratum can be allocated more than k
+        if seen < k:
+            reservoir.append(span)
+        else:
+            j = rng.randrange(seen + 1)
+            if j < k:
+                reservoir[j] = span
+    alloc = proportional_allocation(counts, k)
+    sample = []
+    for key in sorted(reservoirs):
+        sample.extend(rng.sample(reservoirs[key], alloc[key]))
+    logging.info(f"Stratified by {stratify_by}: {len(counts):,} strata")
+    return sorted(sample)
+
+
+def sample_records(input_path, k: int, seed: int = DEFAULT_SEED,
+                   stratify_by: Optional[str] = None) -> pd.DataFrame:
+    """
+    'file' and 'message' of a seeded sample of `k` records (see
+    sample_spans), indexed by source row. Only sampled messages are decoded.
+    """
+    csv_path = Path(input_path)
+    if not csv_path.is_file():
+        logging.error(f"CSV file not found: {csv_path}")
+        sys.exit(1)
+    if stratify_by is not None and stratify_by not in STRATA:
+        logging.error(f"Unknown stratification {stratify_by!r}; expected one of {sorted(STRATA)}")
+        sys.exit(1)
+    with open(csv_path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        spans = sample_spans(csv_path, mm, k, seed, stratify_by)
+        messages = [mm[start:end].replace(b'""', b'"').decode('utf-8') for _, _, start, _, end in spans]
+    return pd.DataFrame({'file': [span[1] for span in spans], 'message': messages},
+                        index=[span[0] for span in spans])
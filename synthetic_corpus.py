@@ -0,0 +1,229 @@
+import csv
+import sys
+import math
+import random
+import itertools
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# Body length in words: lognormal with this median and sigma (Enron bodies are heavy-tailed)
+BODY_WORDS_MEDIAN = 120
+BODY_WORDS_SIGMA = 1.1
+# Share of messages that quote an earlier message of the same thread
+QUOTE_RATE = 0.35
+# Expected PII values embedded per 100 body words
+PII_PER_100_WORDS = 1.5
+# Distinct mailbox owners and subjects; subjects are drawn Zipf-like so threads form
+N_PEOPLE = 400
+N_SUBJECTS = 5_000
+# Quoted history carried into a reply is cut to this many characters
+QUOTE_MAX_CHARS = 20_000
+
+FIRST_NAMES = [
+    'Sara', 'William', 'Jeff', 'Mark', 'Paul', 'Rod', 'Vince', 'Kay', 'Louise', 'Sally',
+    'Kenneth', 'Greg', 'Richard', 'Steven', 'Tana', 'Chris', 'Susan', 'Phillip', 'Eric', 'Joe',
+    'Michelle', 'Gerald', 'Debra', 'Elizabeth', 'Daren', 'Kate', 'John', 'Mary', 'Janet', 'David',
+]
+LAST_NAMES = [
+    'Shackleton', 'Bradford', 'Dasovich', 'Taylor', 'Radous', 'Nelson', 'Kaminski', 'Mann',
+    'Kitchen', 'Beck', 'Lay', 'Whalley', 'Shapiro', 'Kean', 'Jones', 'Germany', 'Scott', 'Allen',
+    'Bass', 'Parks', 'Lokay', 'Nemec', 'Perlingiere', 'Sager', 'Farmer', 'Symes', 'Arnold',
+    'Hain', 'Dorland', 'Haedicke',
+]
+FOLDERS = ['inbox', 'sent', 'sent_items', 'all_documents', 'deleted_items', 'discussion_threads',
+           'notes_inbox', 'calendar', 'california', 'contracts']
+VOCABULARY = (
+    "the of to and a in for is that on be with this will as have at are we by from it i you our "
+    "please deal gas power price contract credit trading meeting call attached agreement review "
+    "market energy capacity transport schedule volume settlement invoice legal draft comments "
+    "week today tomorrow thanks let me know if any questions regarding update would like need "
+    "california utility counterparty hedge position risk desk book curve forward swap option "
+    "pipeline storage demand supply customer offer bid approval signed documents changes"
+).split()
+SUBJECT_WORDS = (
+    "Credit Derivatives Gas Deal Meeting Update Contract Review Agreement Schedule Invoice "
+    "Trading Report Position California Power Draft Comments Lunch Conference Call Budget "
+    "Storage Pipeline Capacity Settlement Approval Request Weekly Summary Curve Options"
+).split()
+PREFIXES = ['', '', '', 'Re: ', 'RE: ', 'FW: ', 'Fwd: ', 'Re: Re: ']
+
+
+def _luhn_complete(digits: List[int]) -> List[int]:
+    """
+    Append the Luhn check digit to `digits`.
+    """
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        if i % 2 == 0:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return digits + [(10 - total % 10) % 10]
+
+
+def _people(rng: random.Random) -> List[dict]:
+    """
+    Mailbox owners with Enron-style names, addresses and Notes identities.
+    """
+    people = []
+    for _ in range(N_PEOPLE):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        people.append({
+            'name': f"{first} {last}",
+            'email': f"{first.lower()}.{last.lower()}@enron.com",
+            'notes': f"{first} {last}/{rng.choice(['HOU', 'NA', 'LON', 'Corp'])}/{rng.choice(['ECT', 'Enron', 'EES'])}",
+            'mailbox': f"{last.lower()}-{first[0].lower()}",
+        })
+    return people
+
+
+def _pii_value(rng: random.Random, people: List[dict]) -> str:
+    """
+    One embedded PII value: a name, address, phone, SSN or card number.
+    """
+    kind = rng.random()
+    if kind < 0.35:
+        return rng.choice(people)['name']
+    if kind < 0.55:
+        return rng.choice(people)['email']
+    if kind < 0.8:
+        return f"({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}"
+    if kind < 0.9:
+        return f"{rng.randint(100, 665):03d}-{rng.randint(1, 99):02d}-{rng.randint(1, 9999):04d}"
+    digits = _luhn_complete([4] + [rng.randint(0, 9) for _ in range(14)])
+    return ' '.join(''.join(map(str, digits[i:i + 4])) for i in range(0, 16, 4))
+
+
+def _body(rng: random.Random, people: List[dict], median: float, sigma: float, pii_rate: float) -> str:
+    """
+    Paragraphs of vocabulary words with PII values spliced in and a sign-off.
+    """
+    n_words = max(3, int(rng.lognormvariate(math.log(median), sigma)))
+    words = rng.choices(VOCABULARY, k=n_words)
+    expected = n_words * pii_rate / 100
+    for _ in range(int(expected) + (rng.random() < expected % 1)):
+        words[rng.randrange(n_words)] = _pii_value(rng, people)
+    lines = []
+    for start in range(0, n_words, 12):
+        line = ' '.join(words[start:start + 12])
+        lines.append(line)
+        if rng.random() < 0.15:
+            lines.append('')
+    lines[0] = lines[0][:1].upper() + lines[0][1:]
+    return '\n'.join(lines) + f"\n\nThanks,\n{rng.choice(people)['name'].split()[0]}"
+
+
+def _date(rng: random.Random) -> datetime:
+    """
+    Random send time between 1999 and 2001.
+    """
+    return datetime(1999, 1, 1) + timedelta(seconds=rng.randrange(3 * 365 * 86400))
+
+
+def _fold(addresses: List[str]) -> str:
+    """
+    Join addresses the way the Enron headers do, folding after every third.
+    """
+    chunks = [', '.join(addresses[i:i + 3]) for i in range(0, len(addresses), 3)]
+    return ', \n\t'.join(chunks)
+
+
+def generate_messages(rows: int, seed: int = 42, body_words_median: float = BODY_WORDS_MEDIAN,
+                      body_words_sigma: float = BODY_WORDS_SIGMA, quote_rate: float = QUOTE_RATE,
+                      pii_per_100_words: float = PII_PER_100_WORDS) -> Iterator[Tuple[str, str]]:
+    """
+    Yield `rows` (file, message) pairs shaped like the Enron corpus: the full
+    15-header set with folded recipient lists, lognormal body lengths, PII
+    embedded in bodies, and Outlook/Notes-style quoted replies that repeat
+    earlier messages of the same subject thread. Output depends only on the
+    arguments.
+    """
+    rng = random.Random(seed)
+    people = _people(rng)
+    subjects = [' '.join(rng.sample(SUBJECT_WORDS, rng.randint(1, 4))) for _ in range(N_SUBJECTS)]
+    # Zipf-like subject popularity
+    cum_weights = list(itertools.accumulate(1 / (k + 1) for k in range(N_SUBJECTS)))
+    threads = {}
+    counters = {}
+
+    for _ in range(rows):
+        sender = rng.choice(people)
+        recipients = rng.sample(people, rng.choices([1, 2, 3, 5, 8], weights=[50, 20, 15, 10, 5])[0])
+        subject_id = rng.choices(range(N_SUBJECTS), cum_weights=cum_weights)[0]
+        date = _date(rng)
+        body = _body(rng, people, body_words_median, body_words_sigma, pii_per_100_words)
+
+        previous = threads.get(subject_id)
+        if previous is not None and rng.random() < quote_rate:
+            prev_sender, prev_date, prev_body = previous
+            if rng.random() < 0.6:
+                body += (f"\n\n -----Original Message-----\nFrom: \t{prev_sender['name']}  \n"
+                         f"Sent:\t{prev_date:%A, %B %d, %Y %I:%M %p}\nTo:\t{sender['name']}\n"
+                         f"Subject:\t{subjects[subject_id]}\n\n{prev_body}")
+            else:
+                body += (f"\n\n\n\n\t{prev_sender['name']}\n\t{prev_date:%m/%d/%Y %I:%M %p}\n\t\t \n"
+                         f"\t\t To: {sender['notes']}@ECT\n\t\t cc: \n\t\t Subject: {subjects[subject_id]}"
+                         f"\n\n{prev_body}")
+        threads[subject_id] = (sender, date, body[:QUOTE_MAX_CHARS])
+
+        folder = rng.choice(FOLDERS)
+        key = (sender['mailbox'], folder)
+        counters[key] = counters.get(key, 0) + 1
+        message = (
+            f"Message-ID: <{rng.randrange(10 ** 7, 10 ** 8)}.{rng.randrange(10 ** 12, 10 ** 13)}.JavaMail.evans@thyme>\n"
+            f"Date: {date:%a, %d %b %Y %H:%M:%S} -0700 (PDT)\n"
+            f"From: {sender['email']}\n"
+            f"To: {_fold([p['email'] for p in recipients])}\n"
+            f"Subject: {rng.choice(PREFIXES)}{subjects[subject_id]}\n"
+            f"Mime-Version: 1.0\n"
+            f"Content-Type: text/plain; charset=us-ascii\n"
+            f"Content-Transfer-Encoding: 7bit\n"
+            f"X-From: {sender['name']}\n"
+            f"X-To: {', '.join(p['name'] for p in recipients)}\n"
+            f"X-cc: \n"
+            f"X-bcc: \n"
+            f"X-Folder: \\{sender['name'].replace(' ', '_')}_Dec2000\\Notes Folders\\{folder}\n"
+            f"X-Origin: {sender['mailbox'].upper()}\n"
+            f"X-FileName: {sender['mailbox'].replace('-', '')}.nsf\n"
+            f"\n{body}"
+        )
+        yield f"{sender['mailbox']}/{folder}/{counters[key]}.", message
+
+
+def write_corpus(path, rows: int, seed: int = 42, **kwargs) -> Path:
+    """
+    Stream a synthetic corpus (see generate_messages) to a 'file,message' CSV.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['file', 'message'])
+        writer.writerows(generate_messages(rows, seed, **kwargs))
+    tmp_path.replace(path)
+    logging.info(f"Wrote synthetic corpus {path} ({rows:,} rows, seed {seed})")
+    return path
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    out_path = sys.argv[2] if len(sys.argv) > 2 else f"emails_synthetic_{rows}.csv"
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+    write_corpus(out_path, rows, seed)
+    print(f"Done. Synthetic corpus saved to {out_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+# The modules live flat in the repository root
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(scope='session')
+def bodies():
+    """
+    Parsed bodies of the sample emails shipped with the repository.
+    """
+    import pandas as pd
+    from email_parser import parse_series
+    return parse_series(pd.read_csv(ROOT / 'emails_100.csv', encoding='utf-8')['message'])['Body'].tolist()
+
+
+@pytest.fixture(scope='session')
+def tokenizer(bodies):
+    """
+    Small WordPiece tokenizer trained on `bodies`, with BERT's normalizer,
+    pre-tokenizer and special tokens.
+    """
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors, trainers
+    from transformers import PreTrainedTokenizerFast
+    specials = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+    backend = Tokenizer(models.WordPiece(unk_token='[UNK]'))
+    backend.normalizer = normalizers.BertNormalizer(lowercase=True)
+    backend.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    backend.train_from_iterator(bodies, trainers.WordPieceTrainer(vocab_size=500, special_tokens=specials))
+    backend.post_processor = processors.TemplateProcessing(
+        single='[CLS] $A [SEP]', special_tokens=[('[CLS]', 2), ('[SEP]', 3)])
+    return PreTrainedTokenizerFast(tokenizer_object=backend, unk_token='[UNK]', pad_token='[PAD]',
+                                   cls_token='[CLS]', sep_token='[SEP]', mask_token='[MASK]',
+                                   model_max_length=64)
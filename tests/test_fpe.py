@@ -0,0 +1,79 @@
+import pytest
+
+pytest.importorskip('cryptography')
+from fpe import MAX_LEN, encrypt_entities, encrypt_values, ff3_1_batch, make_encryptor
+
+# FF3-1 (56-bit tweak) sample vectors, radix 10: key, tweak, plaintext, ciphertext
+FF3_1_VECTORS = [
+    ("2DE79D232DF5585D68CE47882AE256D6", "CBD09280979564", "3992520240", "8901801106"),
+    ("01C63017111438F7FC8E24EB16C71AB5", "C4E822DCD09F27",
+     "60761757463116869318437658042297305934914824457484538562",
+     "35637144092473838892796702739628394376915177448290847293"),
+    ("1A58964B681384806A5A7639915ED0BE837C9C50C150AFD8F73445C0438CACF3", "CE3EBD69454984",
+     "4752683571", "2234571788"),
+]
+KEY = bytes(range(16))
+
+
+def digits(value):
+    return [int(c) for c in value]
+
+
+@pytest.mark.parametrize('key, tweak, plaintext, ciphertext', FF3_1_VECTORS)
+def test_ff3_1_vectors(key, tweak, plaintext, ciphertext):
+    encryptor = make_encryptor(bytes.fromhex(key))
+    tweak = bytes.fromhex(tweak)
+    assert ff3_1_batch(encryptor, [digits(plaintext)], [tweak], 10) == [digits(ciphertext)]
+    assert ff3_1_batch(encryptor, [digits(ciphertext)], [tweak], 10, decrypt=True) == [digits(plaintext)]
+
+
+def test_ff3_1_batch_matches_single_calls():
+    encryptor = make_encryptor(KEY)
+    numerals = [digits(plaintext) for _, _, plaintext, _ in FF3_1_VECTORS]
+    tweaks = [bytes.fromhex(tweak) for _, tweak, _, _ in FF3_1_VECTORS]
+    batched = ff3_1_batch(encryptor, numerals, tweaks, 10)
+    assert batched == [ff3_1_batch(encryptor, [n], [t], 10)[0] for n, t in zip(numerals, tweaks)]
+
+
+@pytest.mark.parametrize('group, values', [
+    ('PHONENUMBER', ['713-853-5620', '(713) 345-7896', '+1 800 555 0199']),
+    ('EMAIL', ['jeff.skilling@enron.com', 'Sara.Shackleton@ENRON.com']),
+    ('URL', ['http://www.enron.com/corp/index.html', 'www.example.org']),
+    ('FIRSTNAME', ['Vince', 'Sherron', 'José']),
+    ('CREDITCARDNUMBER', ['4111 1111 1111 1111', '1' * (MAX_LEN['digit'] * 2 + 5)]),
+])
+def test_encrypt_values_round_trip(group, values):
+    encryptor = make_encryptor(KEY)
+    encrypted = encrypt_values(values, group, encryptor)
+    assert encrypt_values(encrypted, group, encryptor, decrypt=True) == values
+    assert encrypted != values
+    for value, token in zip(values, encrypted):
+        assert len(token) == len(value)
+        for a, b in zip(value, token):
+            # Digits stay digits, letters keep their case, everything else is kept
+            assert a.isdigit() == b.isdigit() and a.isupper() == b.isupper() and a.islower() == b.islower()
+            if not (a.isascii() and a.isalnum()):
+                assert a == b
+
+
+def test_shape_kept_in_clear():
+    encryptor = make_encryptor(KEY)
+    email, = encrypt_values(['jeff.skilling@enron.com'], 'EMAIL', encryptor)
+    url, = encrypt_values(['https://www.enron.com/'], 'URL', encryptor)
+    assert email.endswith('.com') and email.count('@') == 1
+    assert url.startswith('https://www.') and url.endswith('.com/')
+
+
+def test_encrypt_entities_round_trip():
+    encryptor = make_encryptor(KEY)
+    texts = ["Call 713-853-5620 or mail jeff@enron.com", "Ask Vince at 713-853-5620"]
+    entities = [[{'entity_group': 'PHONENUMBER', 'start': 5, 'end': 17},
+                 {'entity_group': 'EMAIL', 'start': 26, 'end': 40}],
+                [{'entity_group': 'FIRSTNAME', 'start': 4, 'end': 9},
+                 {'entity_group': 'PHONENUMBER', 'start': 13, 'end': 25}]]
+    tokens = encrypt_entities(texts, entities, encryptor)
+    # Equal values of one group get equal tokens across texts
+    assert tokens[0][0] == tokens[1][1]
+    for text, row, row_tokens in zip(texts, entities, tokens):
+        for e, token in zip(row, row_tokens):
+            assert encrypt_values([token], e['entity_group'], encryptor, decrypt=True) == [text[e['start']:e['end']]]
@@ -0,0 +1,62 @@
+import pytest
+from pii_tokens import TokenStore, build_token_store, slice_tokens, special_affixes
+
+TEXTS = [
+    "Please call John Smith at 713-853-5620 about the Enron gas contract.",
+    "Forward this to jeff.skilling@enron.com before Friday.",
+    " ".join(["Sara Shackleton asked Mark Taylor to review the ISDA schedule."] * 6),
+    "",
+]
+
+
+def test_store_round_trip(tmp_path, tokenizer):
+    store = TokenStore(build_token_store(TEXTS, tokenizer, tmp_path / 'store'))
+    assert len(store) == 3 and store.matches(tokenizer)
+    assert store.get("not stored") is None
+    for text in TEXTS[:3]:
+        arrays = store.get(text)
+        encoded = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        assert arrays.input_ids.tolist() == encoded['input_ids']
+        assert arrays.offsets.tolist() == [list(pair) for pair in encoded['offset_mapping']]
+        # A slice from a word start carries the same tokens as tokenizing that span on its own
+        first = int(arrays.word_starts[3:].argmax()) + 3
+        start, end = int(arrays.offsets[first, 0]), int(arrays.offsets[-1, 1])
+        ids, offsets = slice_tokens(arrays, start, end)
+        assert ids.tolist() == tokenizer(text[start:end], add_special_tokens=False)['input_ids']
+        assert offsets[0, 0] == 0 and offsets[-1, 1] == end - start
+    # Padding and truncation set by earlier calls do not change the tokenizer's identity
+    tokenizer(TEXTS, padding=True, truncation=True)
+    assert store.matches(tokenizer)
+    prefix, suffix = special_affixes(tokenizer)
+    assert prefix.tolist() == [tokenizer.cls_token_id] and suffix.tolist() == [tokenizer.sep_token_id]
+
+
+def test_stored_tokens_match_text_path(tmp_path, monkeypatch, tokenizer):
+    torch = pytest.importorskip('torch')
+    from transformers import BertConfig, BertForTokenClassification, pipeline
+    import pii_entities
+
+    labels = ['O', 'B-NAME', 'I-NAME', 'B-EMAIL', 'I-EMAIL']
+    config = BertConfig(vocab_size=len(tokenizer), hidden_size=32, num_hidden_layers=1, num_attention_heads=2,
+                        intermediate_size=64, max_position_embeddings=64, num_labels=len(labels),
+                        id2label=dict(enumerate(labels)), label2id={l: i for i, l in enumerate(labels)})
+    torch.manual_seed(0)
+    model = BertForTokenClassification(config).eval()
+    pii_pipe = pipeline('token-classification', model=model, tokenizer=tokenizer, aggregation_strategy='simple')
+    store = build_token_store(TEXTS, tokenizer, tmp_path / 'store')
+
+    # The long text is split into windows on both paths
+    kwargs = dict(batch_size=2, max_tokens=40, stride=8)
+    stats = {}
+    from_text = pii_entities.detect_pii(pii_pipe, TEXTS, stats=stats, **kwargs)
+    assert stats['windowed_texts'] == 1 and any(from_text)
+
+    def no_text_path(*args):
+        raise AssertionError("stored texts fell back to the text path")
+    monkeypatch.setattr(pii_entities, 'run_batch', no_text_path)
+    from_tokens = pii_entities.detect_pii(pii_pipe, TEXTS, tokens=str(store), **kwargs)
+    for text_entities, token_entities in zip(from_text, from_tokens):
+        assert [(e['entity_group'], e['start'], e['end'], e['word']) for e in token_entities] == \
+               [(e['entity_group'], e['start'], e['end'], e['word']) for e in text_entities]
+        assert [e['score'] for e in token_entities] == \
+               pytest.approx([e['score'] for e in text_entities], abs=1e-5)
@@ -0,0 +1,75 @@
+import pytest
+from email_parser import parse_message
+from pii_entities import WINDOW_MARGIN, dedupe_overlaps, detect_pii, split_units
+from pii_stub import StubPIIPipeline
+from synthetic_corpus import generate_messages
+
+MAX_TOKENS = 64
+STRIDE = 16
+
+
+@pytest.fixture(scope='module')
+def synthetic_bodies():
+    """
+    Bodies of synthetic emails, with names, phone numbers and addresses embedded.
+    """
+    return [parse_message(message)['Body'] for _, message in generate_messages(200, seed=7)]
+
+
+@pytest.fixture
+def windowed_stub(tokenizer):
+    """
+    Stub pipeline with a tokenizer, so detect_pii splits long texts into windows.
+    """
+    pipe = StubPIIPipeline()
+    pipe.tokenizer = tokenizer
+    return pipe
+
+
+def test_windows_cover_text_at_word_starts(windowed_stub, tokenizer, bodies):
+    units = split_units(windowed_stub, bodies, max_tokens=MAX_TOKENS, stride=STRIDE)
+    assert sorted({unit[0] for unit in units}) == list(range(len(bodies)))
+    windowed = 0
+    for pos, text in enumerate(bodies):
+        windows = [unit[1:] for unit in units if unit[0] == pos]
+        encoded = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = encoded['offset_mapping']
+        assert all(count <= MAX_TOKENS for _, _, count in windows)
+        if len(windows) == 1:
+            assert windows[0][:2] == (0, len(text))
+            continue
+        windowed += 1
+        word_ids = encoded.word_ids()
+        word_starts = {offsets[i][0] for i, word in enumerate(word_ids) if i == 0 or word != word_ids[i - 1]}
+        assert windows[0][0] == offsets[0][0] and windows[-1][1] == offsets[-1][1]
+        for (start, end, _), (next_start, _, _) in zip(windows, windows[1:]):
+            # Consecutive windows overlap and each starts on a word
+            assert start < next_start < end
+            assert next_start in word_starts
+    assert windowed
+
+
+@pytest.mark.parametrize('stride', [-1, MAX_TOKENS - 2 - WINDOW_MARGIN, 1000])
+def test_stride_outside_window_rejected(windowed_stub, bodies, stride):
+    with pytest.raises(ValueError):
+        split_units(windowed_stub, bodies, max_tokens=MAX_TOKENS, stride=stride)
+
+
+def test_window_entities_map_back_to_full_text(windowed_stub, synthetic_bodies):
+    stats = {}
+    windowed = detect_pii(windowed_stub, synthetic_bodies, max_tokens=MAX_TOKENS, stride=STRIDE, stats=stats)
+    whole = detect_pii(StubPIIPipeline(), synthetic_bodies)
+    assert stats['windowed_texts'] > 0 and any(whole)
+    for text, window_entities, text_entities in zip(synthetic_bodies, windowed, whole):
+        spans = [(e['entity_group'], e['start'], e['end']) for e in window_entities]
+        assert spans == [(e['entity_group'], e['start'], e['end']) for e in text_entities]
+        assert all(text[e['start']:e['end']] == e['word'] for e in window_entities)
+
+
+def test_dedupe_overlaps_keeps_entity_farthest_from_cut():
+    cut = {'entity_group': 'NAME', 'start': 10, 'end': 14, 'score': 0.99}
+    whole = {'entity_group': 'NAME', 'start': 10, 'end': 20, 'score': 0.8}
+    other = {'entity_group': 'EMAIL', 'start': 25, 'end': 40, 'score': 0.9}
+    assert dedupe_overlaps([(cut, 0), (whole, 12), (other, 5)]) == [whole, other]
+    # At equal distance the higher score wins
+    assert dedupe_overlaps([(whole, 3), (cut, 3)]) == [cut]
@@ -0,0 +1,65 @@
+import io
+import os
+import shutil
+import pandas as pd
+import pytest
+from conftest import ROOT
+from record_index import RecordIndex, build_record_index, index_is_current
+
+# Quoted file names with commas, "" escapes, an unquoted message and no final newline
+EDGE_CSV = (
+    'file,message\n'
+    '"a,b/1.","Subject: ""hi""\nTo: x@enron.com\n\nbody, with ""quotes""\n"\n'
+    'plain/2.,Subject: no body\n'
+    '"c/3.","Subject: y\n\nline1\n\nline2"'
+)
+
+
+@pytest.fixture(params=['sample', 'edge'])
+def csv_path(request, tmp_path):
+    path = tmp_path / 'emails.csv'
+    if request.param == 'sample':
+        shutil.copy(ROOT / 'emails_100.csv', path)
+    else:
+        path.write_text(EDGE_CSV, encoding='utf-8')
+    return path
+
+
+def test_records_match_csv(csv_path):
+    expected = pd.read_csv(csv_path, encoding='utf-8', keep_default_na=False)
+    with RecordIndex(csv_path) as index:
+        assert len(index) == len(expected)
+        assert list(index.records()) == list(zip(expected['file'], expected['message']))
+        for row, (file, message) in enumerate(zip(expected['file'], expected['message'])):
+            assert index.position(file) == row and index.file(row) == file
+            assert index.header_bytes(row).decode('utf-8') == message.split('\n\n', 1)[0]
+        assert index.position('missing/1.') == -1
+        assert list(index.records([2, 0])) == [(expected['file'][2], expected['message'][2]),
+                                              (expected['file'][0], expected['message'][0])]
+
+
+@pytest.mark.parametrize('n', [1, 2, 3, 7])
+def test_shards_are_whole_rows_back_to_back(csv_path, n):
+    expected = pd.read_csv(csv_path, encoding='utf-8', keep_default_na=False)
+    data = csv_path.read_bytes()
+    with RecordIndex(csv_path) as index:
+        shards = index.shards(n)
+    assert 1 <= len(shards) <= n
+    assert shards[0][0] == 0 and shards[0][2] == data.index(b'\n') + 1
+    assert shards[-1][1] == len(expected) and shards[-1][3] == len(data)
+    for (_, end_row, _, end_byte), (next_row, _, next_byte, _) in zip(shards, shards[1:]):
+        assert (end_row, end_byte) == (next_row, next_byte)
+    for first, end, start_byte, end_byte in shards:
+        # Each byte range parses on its own into exactly its rows
+        chunk = pd.read_csv(io.BytesIO(b'file,message\n' + data[start_byte:end_byte]),
+                            encoding='utf-8', keep_default_na=False)
+        assert chunk['file'].tolist() == expected['file'][first:end].tolist()
+
+
+def test_index_rebuilt_when_csv_changes(csv_path):
+    path = build_record_index(csv_path)
+    assert index_is_current(csv_path)
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert not index_is_current(csv_path)
+    assert build_record_index(csv_path) == path and index_is_current(csv_path)
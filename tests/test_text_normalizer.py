@@ -0,0 +1,66 @@
+import random
+from pathlib import Path
+import pytest
+import pandas as pd
+from text_normalizer import BLANK_RUNS, NEWLINE_RUNS, make_normalizer, normalize_series
+
+# Sample of raw emails shipped with the repository
+EMAILS_CSV = Path(__file__).resolve().parents[1] / 'emails_100.csv'
+
+# Blank-line regex of the chained clean_dataframe rules each normalizer replaces
+OLD_BLANK_RES = {NEWLINE_RUNS: r"\n{3,}", BLANK_RUNS: r"([ \t]*\n){2,}"}
+EDGE_CASES = [
+    '', ' ', '\t', '\n', '\n\n', '\n\n\n', ' \n \n ', 'a \t\n\t \nb', 'a..b...c.', '.. ..',
+    'line\n\n\n\nnext', 'line \n\t\n  \nnext', '  lead and trail \t', '\r\n\r\n\r\n', '\xa0a\xa0 \xa0',
+    'a\n \n\n \t\nb', 'x\t\t.\n\n\n...\n \n', 'é  ü\t\t..\n\n\n',
+]
+
+
+def old_chain(series: pd.Series, blank_lines, repl: str) -> pd.Series:
+    """
+    The chained .str rules that clean_dataframe ran before make_normalizer.
+    """
+    out = (series.fillna('').astype(str)
+           .str.replace(r"[ \t]+", ' ', regex=True)
+           .str.strip()
+           .str.replace(r"\.{2,}", '.', regex=True))
+    return out.str.replace(OLD_BLANK_RES[blank_lines], repl, regex=True) if blank_lines else out
+
+
+def fuzz(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    alphabet = [' ', ' ', '\t', '\n', '\n', '.', '.', 'a', 'b', '\r', '\xa0', 'é']
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30))) for _ in range(n)]
+
+
+@pytest.mark.parametrize('blank_lines, repl', [
+    (NEWLINE_RUNS, '\n\n'), (NEWLINE_RUNS, '\n'), (BLANK_RUNS, '\n\n'), (BLANK_RUNS, '\n'), (None, '\n'),
+])
+def test_matches_old_chain(blank_lines, repl):
+    series = pd.Series(EDGE_CASES + fuzz(5000) + [None, float('nan')])
+    normalized = normalize_series(series, make_normalizer(blank_lines, repl))
+    assert normalized.tolist() == old_chain(series, blank_lines, repl).tolist()
+
+
+def test_normalize_series_keeps_index_and_name():
+    series = pd.Series(['a  b', None], index=[7, 9], name='Body')
+    normalized = normalize_series(series, make_normalizer())
+    assert normalized.tolist() == ['a b', ''] and normalized.index.tolist() == [7, 9] and normalized.name == 'Body'
+
+
+def test_rules_can_be_switched_off():
+    normalize = make_normalizer(None, spaces=False, strip=False, periods=False)
+    assert normalize(' a  ..\n\n\n') == ' a  ..\n\n\n'
+
+
+def test_unknown_blank_line_rule():
+    with pytest.raises(ValueError):
+        make_normalizer('tabs')
+
+
+def test_cleaning_during_parse_matches_cleaning_after():
+    from email_parser import parse_series
+    messages = pd.read_csv(EMAILS_CSV, encoding='utf-8')['message']
+    normalize = make_normalizer(BLANK_RUNS, '\n')
+    during = parse_series(messages, normalize=normalize)['Body']
+    assert during.tolist() == normalize_series(parse_series(messages)['Body'], normalize).tolist()
@@ -0,0 +1,72 @@
+import re
+import random
+import pandas as pd
+import pytest
+from email_parser import parse_series
+from synthetic_corpus import write_corpus
+from thread_index import build_thread_index, load_thread_index, normalize_subjects, thread_members, thread_rows
+
+EDGE_CASES = [
+    'Re: Gas deal', 'RE: FW: Re: Gas deal', 'Fwd:Fwd: x', 're re: x', 'Re:', 'Re: ', 'Re', 're x', 'Rebate',
+    'FW : : budget', '  Re:\tRe :x ', 'Fw:re:fwd:', 'Re:  :Re: y', 'fwd fw re', 'Re \xa0Re: z', '', None,
+]
+
+
+def strip_subject_prefixes(subj: str) -> str:
+    """
+    The strip-and-repeat loop normalize_subjects replaced.
+    """
+    prefix_pattern = re.compile(r'(?i)^(?:re|fw|fwd)[:\s]+')
+    while True:
+        new_subj = prefix_pattern.sub('', subj).strip()
+        if new_subj == subj:
+            break
+        subj = new_subj
+    return subj
+
+
+def fuzz(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    pieces = ['re', 'RE', 'Re', 'fw', 'FW', 'fwd', 'Fwd', ':', ':', ' ', ' ', '\t', '\xa0', 'x', 'deal']
+    return [''.join(rng.choice(pieces) for _ in range(rng.randint(0, 8))) for _ in range(n)]
+
+
+def test_normalize_subjects_matches_old_loop():
+    subjects = pd.Series(EDGE_CASES + fuzz(20000))
+    expected = [strip_subject_prefixes(s if isinstance(s, str) else '') for s in subjects]
+    assert normalize_subjects(subjects).tolist() == expected
+
+
+@pytest.fixture(scope='module')
+def threads(tmp_path_factory):
+    """
+    Synthetic corpus with reply threads, its cache directory and its thread index.
+    """
+    tmp = tmp_path_factory.mktemp('threads')
+    source = write_corpus(tmp / 'emails.csv', 500, seed=3)
+    cache_dir = str(tmp / 'cache')
+    return source, cache_dir, load_thread_index(source, cache_dir=cache_dir)
+
+
+def test_thread_index_groups_rows_by_subject(threads):
+    source, cache_dir, index = threads
+    parsed = parse_series(pd.read_csv(source, encoding='utf-8')['message'], fields=['Subject'])
+    subjects = normalize_subjects(parsed['Subject']).to_numpy()
+    expected = pd.Series(range(len(subjects)))[subjects != ''].groupby(subjects[subjects != '']).agg(list)
+
+    assert index['count'].tolist() == sorted(index['count'], reverse=True)
+    assert dict(zip(index['subject'], map(list, index['row_ids']))) == expected.to_dict()
+    assert (index['first_date'] <= index['last_date']).all()
+    members = thread_members(index)
+    assert members.index.is_monotonic_increasing and (members.to_numpy() == subjects[members.index]).all()
+
+    subject = index['subject'].iloc[0]
+    assert thread_rows(source, subject, cache_dir=cache_dir).tolist() == list(index['row_ids'].iloc[0])
+    assert len(thread_rows(source, 'no such subject', cache_dir=cache_dir)) == 0
+    assert build_thread_index(source, cache_dir=cache_dir).is_file()
+
+
+def test_min_count_filter(threads):
+    source, cache_dir, index = threads
+    busy = load_thread_index(source, min_count=1, cache_dir=cache_dir)
+    assert len(busy) and busy['subject'].tolist() == index.loc[index['count'] > 1, 'subject'].tolist()
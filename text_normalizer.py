@@ -0,0 +1,71 @@
+import re
+from typing import Callable, Optional
+import pandas as pd
+from email_parser import SPACES_RE
+
+# Blank-line rules used by the clean_dataframe variants
+NEWLINE_RUNS = 'newlines'   # r"\n{3,}": three or more consecutive line breaks
+BLANK_RUNS = 'blank'        # r"([ \t]*\n){2,}": two or more line breaks with only spaces/tabs between
+
+PERIODS_RE = re.compile(r'\.{2,}')
+NEWLINE_RUN_RE = re.compile(r'\n\n\n+')
+# Starts at a line break rather than at every space; spaces/tabs before it are folded in by hand
+BLANK_RUN_RE = re.compile(r'\n(?:[ \t]*\n)+')
+
+
+def _replace_blank_runs(text: str, repl: str) -> str:
+    """
+    r"([ \t]*\n){2,}" -> repl, matching from the first line break of each run
+    and then stepping back over the spaces/tabs in front of it.
+    """
+    pieces = []
+    last = 0
+    for m in BLANK_RUN_RE.finditer(text):
+        start = m.start()
+        while start > last and text[start - 1] in ' \t':
+            start -= 1
+        pieces.append(text[last:start])
+        pieces.append(repl)
+        last = m.end()
+    if not pieces:
+        return text
+    pieces.append(text[last:])
+    return ''.join(pieces)
+
+
+def make_normalizer(blank_lines: Optional[str] = BLANK_RUNS, blank_line_repl: str = '\n\n',
+                    spaces: bool = True, strip: bool = True, periods: bool = True) -> Callable[[str], str]:
+    """
+    Build a str -> str cleaner giving exactly the result of the chained
+    regex rules it replaces, in their order: collapse runs of spaces/tabs
+    to one space, strip, collapse runs of periods to one, then replace
+    blank-line runs (NEWLINE_RUNS, BLANK_RUNS or None) by `blank_line_repl`.
+    Each string is handed to a rule's regex only when a substring test
+    shows the rule has something to change.
+    """
+    if blank_lines not in (NEWLINE_RUNS, BLANK_RUNS, None):
+        raise ValueError(f"Unknown blank-line rule: {blank_lines!r}")
+
+    def normalize(text: str) -> str:
+        if spaces and ('\t' in text or '  ' in text):
+            text = SPACES_RE.sub(' ', text)
+        if strip:
+            text = text.strip()
+        if periods and '..' in text:
+            text = PERIODS_RE.sub('.', text)
+        if blank_lines == NEWLINE_RUNS:
+            if '\n\n\n' in text:
+                text = NEWLINE_RUN_RE.sub(blank_line_repl, text)
+        elif blank_lines == BLANK_RUNS:
+            text = _replace_blank_runs(text, blank_line_repl)
+        return text
+
+    return normalize
+
+
+def normalize_series(series: pd.Series, normalize: Callable[[str], str]) -> pd.Series:
+    """
+    Apply a normalizer to every value of a text column (missing values become '').
+    """
+    return pd.Series([normalize(text) for text in series.fillna('').astype(str)],
+                     index=series.index, name=series.name)
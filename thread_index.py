@@ -0,0 +1,169 @@
+import re
+import sys
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from parsed_cache import CACHE_DIR, build_cache, source_fingerprint
+
+# Configure logging: timestamped entries to 'app.log'
+logging.basicConfig(
+    filename='app.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# Bump whenever subject normalization or the index layout changes
+THREAD_INDEX_VERSION = 1
+# Any run of leading 'Re:', 'FW:', 'Fwd:' prefixes in one pass. After the first prefix,
+# a whitespace-only separator must be followed by text, as the old strip-and-repeat loop
+# stripped the subject before matching again.
+SUBJECT_PREFIX_RE = re.compile(
+    r'^(?:(?:re|fw|fwd)[:\s]+)?(?:\s*(?:re|fw|fwd)(?:[:\s]*:[:\s]*|\s+(?=\S)))*', re.I)
+# Trailing '(PDT)'-style zone names that strptime cannot parse
+DATE_ZONE_RE = re.compile(r'\s*\([^)]*\)\s*$')
+DATE_FORMAT = '%a, %d %b %Y %H:%M:%S %z'
+INDEX_COLUMNS = ['file', 'Subject', 'Date', 'From', 'To']
+
+THREAD_SCHEMA = pa.schema([
+    ('subject', pa.string()),
+    ('count', pa.int32()),
+    ('participants', pa.list_(pa.string())),
+    ('first_date', pa.timestamp('s', tz='UTC')),
+    ('last_date', pa.timestamp('s', tz='UTC')),
+    ('row_ids', pa.list_(pa.int64())),
+])
+
+
+def normalize_subjects(subjects: pd.Series) -> pd.Series:
+    """
+    Strip leading reply/forward prefixes and surrounding whitespace from
+    every subject with one compiled regex pass (same result as repeatedly
+    removing 'Re:'/'FW:'/'Fwd:' and stripping, as the groupby script did).
+    """
+    return subjects.fillna('').astype(str).str.replace(SUBJECT_PREFIX_RE, '', regex=True).str.strip()
+
+
+def parse_dates(dates: pd.Series) -> np.ndarray:
+    """
+    Header dates as UTC epoch seconds; unparseable dates become -1.
+    """
+    parsed = pd.to_datetime(dates.fillna('').str.replace(DATE_ZONE_RE, '', regex=True),
+                            format=DATE_FORMAT, errors='coerce', utc=True)
+    seconds = (parsed - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+    return seconds.fillna(-1).astype(np.int64).to_numpy()
+
+
+def index_file(source, file_pattern: Optional[str] = None, cache_dir: str = CACHE_DIR) -> Path:
+    """
+    Path of the thread index for `source` (and folder filter), keyed by the source content hash.
+    """
+    source = Path(source)
+    scope = re.sub(r'\W+', '_', file_pattern) if file_pattern else 'all'
+    return Path(cache_dir) / f"{source.stem}.{source_fingerprint(source)}.threads.{scope}.v{THREAD_INDEX_VERSION}.parquet"
+
+
+def build_thread_index(source, file_pattern: Optional[str] = None, cache_dir: str = CACHE_DIR) -> Path:
+    """
+    Stream the parsed corpus (see parsed_cache) one row group at a time and
+    group rows by normalized subject in a hash index, keeping per subject
+    the row count, member row ids, participants (From/To addresses) and
+    first/last date. Rows whose 'file' does not contain `file_pattern`
+    (case-insensitive regex) and blank subjects are skipped. The index is
+    written to Parquet, most frequent subjects first; returns its path.
+    """
+    path = index_file(source, file_pattern, cache_dir)
+    if path.is_file():
+        return path
+
+    threads: Dict[str, list] = {}
+    pf = pq.ParquetFile(build_cache(source, cache_dir), memory_map=True)
+    offset = 0
+    for batch in pf.iter_batches(columns=INDEX_COLUMNS):
+        frame = batch.to_pandas()
+        rows = np.arange(offset, offset + len(frame))
+        offset += len(frame)
+        if file_pattern:
+            mask = frame['file'].str.contains(file_pattern, case=False, na=False).to_numpy()
+            frame, rows = frame[mask], rows[mask]
+        subjects = normalize_subjects(frame['Subject'])
+        dates = parse_dates(frame['Date'])
+
+        for subject, row, sender, recipients, date in zip(subjects, rows.tolist(), frame['From'],
+                                                           frame['To'], dates.tolist()):
+            if not subject:
+                continue
+            entry = threads.get(subject)
+            if entry is None:
+                # [row ids, participants, first date, last date]
+                entry = threads[subject] = [[], set(), None, None]
+            entry[0].append(row)
+            for address in f"{sender},{recipients}".split(','):
+                address = address.strip()
+                if address:
+                    entry[1].add(address)
+            if date >= 0:
+                entry[2] = date if entry[2] is None else min(entry[2], date)
+                entry[3] = date if entry[3] is None else max(entry[3], date)
+
+    ordered = sorted(threads.items(), key=lambda item: (-len(item[1][0]), item[0]))
+    table = pa.Table.from_arrays([
+        pa.array([subject for subject, _ in ordered], pa.string()),
+        pa.array([len(entry[0]) for _, entry in ordered], pa.int32()),
+        pa.array([sorted(entry[1]) for _, entry in ordered], pa.list_(pa.string())),
+        pa.array([entry[2] for _, entry in ordered], pa.int64()).cast(pa.timestamp('s', tz='UTC')),
+        pa.array([entry[3] for _, entry in ordered], pa.int64()).cast(pa.timestamp('s', tz='UTC')),
+        pa.array([entry[0] for _, entry in ordered], pa.list_(pa.int64())),
+    ], schema=THREAD_SCHEMA)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    pq.write_table(table, tmp_path, compression='zstd')
+    tmp_path.replace(path)
+    logging.info(f"Built thread index {path}: {len(ordered):,} subjects over {offset:,} rows")
+    return path
+
+
+def load_thread_index(source, file_pattern: Optional[str] = None, min_count: int = 0,
+                      columns: Optional[Sequence[str]] = None, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    Threads with more than `min_count` rows, read from the index (built on
+    first use) with the count filter pushed down into the Parquet scan.
+    """
+    path = build_thread_index(source, file_pattern, cache_dir)
+    filters = [('count', '>', min_count)] if min_count else None
+    return pq.read_table(path, columns=list(columns) if columns else None, filters=filters,
+                         memory_map=True).to_pandas()
+
+
+def thread_members(threads: pd.DataFrame) -> pd.Series:
+    """
+    Normalized subject of every member row, indexed by row id in ascending order.
+    """
+    members = threads[['subject', 'row_ids']].explode('row_ids')
+    return pd.Series(members['subject'].to_numpy(), index=members['row_ids'].to_numpy(dtype=np.int64),
+                     name='Subject').sort_index()
+
+
+def thread_rows(source, subject: str, file_pattern: Optional[str] = None,
+                cache_dir: str = CACHE_DIR) -> np.ndarray:
+    """
+    Row ids of one thread, looked up in the index by normalized subject.
+    """
+    path = build_thread_index(source, file_pattern, cache_dir)
+    table = pq.read_table(path, columns=['row_ids'], filters=[('subject', '==', subject)], memory_map=True)
+    return np.asarray(table.column('row_ids')[0].as_py() if table.num_rows else [], dtype=np.int64)
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else "emails.csv"
+    file_pattern = sys.argv[2] if len(sys.argv) > 2 else None
+    path = build_thread_index(source, file_pattern)
+    print(f"Done. Thread index at {path}")
+
+
+if __name__ == '__main__':
+    main()